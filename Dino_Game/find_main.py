@@ -16,8 +16,7 @@ def has_main_def(text: str) -> bool:
     # If "{" is on same line or within the next few lines, treat as definition.
     # (Avoid false positives from prototypes.)
     start = m.start()
-    snippet = text[start:start + 400]
-    return "{" in snippet
+    return text.find("{", start, start + 400) != -1
 
 def main(argv):
     out = []
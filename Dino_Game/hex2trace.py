@@ -4,12 +4,12 @@ import glob
 import os
 import re
 import sys
-import tempfile
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 
 # IMPORTANT: keep the same imports as your original hex2trace.py
-from rv32i_tests_gen import simulate_commit_trace_from_hex, write_commit_trace
+from rv32i_tests_gen import simulate_commit_trace_from_words, write_commit_trace
 
 VALID_RV32I_OPCODES = {
     0x37,  # LUI
@@ -25,20 +25,21 @@ VALID_RV32I_OPCODES = {
     0x73,  # SYSTEM
 }
 
+COMMENT_RE = re.compile(r"(?:#|//)[^\n]*")
+HEX_WORD_RE = re.compile(r"[0-9a-fA-F]+")
+
 def parse_hex_words(path: str) -> List[int]:
     words: List[int] = []
     with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            line = line.split("#", 1)[0].strip()
-            line = line.split("//", 1)[0].strip()
-            if not line:
-                continue
-            if not re.fullmatch(r"[0-9a-fA-F]+", line):
-                raise RuntimeError(f"{path}: unsupported hex line format: {line!r}")
-            words.append(int(line, 16) & 0xFFFFFFFF)
+        # strip '#' and '//' comments over the whole file in one pass
+        text = COMMENT_RE.sub("", f.read())
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not HEX_WORD_RE.fullmatch(line):
+            raise RuntimeError(f"{path}: unsupported hex line format: {line!r}")
+        words.append(int(line, 16) & 0xFFFFFFFF)
     return words
 
 def looks_like_code_word(w: int) -> bool:
@@ -58,20 +59,23 @@ def decide_is_legacy_app_at_0(app_words: List[int], app_base_words: int) -> bool
     codeb = (len(app_words) > app_base_words) and looks_like_code_word(app_words[app_base_words])
     return bool(code0 and not codeb)
 
-def write_merged_hex(boot_words: List[int], app_words: List[int], app_base_words: int) -> str:
-    total_words = max(len(boot_words), app_base_words + len(app_words))
-    merged = [0] * total_words
-    for i, w in enumerate(boot_words):
-        merged[i] = w
-    for i, w in enumerate(app_words):
-        merged[app_base_words + i] = w
-
-    fd, path = tempfile.mkstemp(prefix="hex2trace_merged_", suffix=".hex")
-    os.close(fd)
-    with open(path, "w") as f:
-        for w in merged:
-            f.write(f"{w:08x}\n")
-    return path
+def merge_words(boot_words: List[int], app_words: List[int], app_base_words: int) -> List[int]:
+    """Boot image at word 0, app at app_base_words; app wins where they overlap."""
+    # Concatenate the regions directly rather than zero-filling the whole
+    # image and copying boot and app over it.
+    head = boot_words[:app_base_words]
+    gap = app_base_words - len(head)
+    tail = boot_words[app_base_words + len(app_words):]
+    return head + [0] * gap + app_words + tail
+
+def trace_one(job: Tuple[List[int], str, int]) -> int:
+    """Simulate one image and write its trace; returns the final x31."""
+    sim_words, out_trace, max_steps = job
+    trace, regs = simulate_commit_trace_from_words(sim_words, max_steps=max_steps)
+
+    # IMPORTANT: CommitEntry list -> file using the project's serializer
+    write_commit_trace(out_trace, trace)
+    return regs[31] & 0xFFFFFFFF
 
 def main() -> None:
     ap = argparse.ArgumentParser()
@@ -85,7 +89,11 @@ def main() -> None:
                     help="App load base in bytes (default: 0x2000)")
     ap.add_argument("--include-boot", action="store_true",
                     help="Also generate trace for boot.hex itself (normally skipped)")
+    ap.add_argument("-j", "--jobs", type=int, default=0,
+                    help="Worker processes (default: one per CPU, 1 = serial)")
     args = ap.parse_args()
+    if args.jobs < 0:
+        ap.error("--jobs must be >= 0")
 
     here = os.path.dirname(os.path.abspath(__file__))
     default_glob = os.path.join(here, "build", "*.hex")
@@ -118,46 +126,48 @@ def main() -> None:
             idx.write(f"# app_base=0x{app_base:08x}\n")
         idx.write("# name  trace_file  final_x31\n")
 
-        for hp in hex_paths:
-            if (not args.include_boot) and boot_norm and os.path.normpath(hp) == boot_norm:
-                continue
+        todo = [hp for hp in hex_paths
+                if args.include_boot or not boot_norm or os.path.normpath(hp) != boot_norm]
 
+        # Read the inputs on a thread pool so their file reads overlap
+        # (read() releases the GIL); results come back in sorted order.
+        with ThreadPoolExecutor() as tp:
+            parsed = list(tp.map(parse_hex_words, todo))
+
+        names: List[str] = []
+        jobs: List[Tuple[List[int], str, int]] = []
+        for hp, app_words in zip(todo, parsed):
             name = os.path.splitext(os.path.basename(hp))[0]
             out_trace = os.path.join(out_dir, f"{name}.truth")
 
-            app_words = parse_hex_words(hp)
-
             # Decide whether to run as legacy or merged SoC image
-            sim_hex = hp
+            sim_words = app_words
             note = "(no boot)"
-            merged_temp = None
 
             if boot_words is not None:
                 if decide_is_legacy_app_at_0(app_words, app_base_words):
-                    sim_hex = hp
                     note = "(legacy app@0x0; boot ignored)"
                 else:
-                    merged_temp = write_merged_hex(boot_words, app_words, app_base_words)
-                    sim_hex = merged_temp
+                    sim_words = merge_words(boot_words, app_words, app_base_words)
                     note = f"(merged boot={args.boot} @0x0, app_base=0x{app_base:08x})"
 
             print(f"[hex2trace] {name}: {hp} -> {out_trace}")
             print(f"           {note}")
 
-            trace, regs = simulate_commit_trace_from_hex(sim_hex, max_steps=args.max_steps)
+            names.append(name)
+            jobs.append((sim_words, out_trace, args.max_steps))
 
-            # IMPORTANT: CommitEntry list -> file using the project's serializer
-            write_commit_trace(out_trace, trace)
+        # Each image simulates independently; run them in parallel but keep
+        # the index in sorted order.
+        if args.jobs == 1 or len(jobs) < 2:
+            results = [trace_one(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=args.jobs or None) as ex:
+                results = list(ex.map(trace_one, jobs))
 
-            final_x31 = regs[31] & 0xFFFFFFFF
+        for name, (_, out_trace, _), final_x31 in zip(names, jobs, results):
             idx.write(f"{name}  {os.path.basename(out_trace)}  0x{final_x31:08x}\n")
 
-            if merged_temp:
-                try:
-                    os.remove(merged_temp)
-                except OSError:
-                    pass
-
     print(f"Done. Wrote traces to: {out_dir}")
     print(f"Index: {index_path}")
 
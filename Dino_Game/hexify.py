@@ -1,18 +1,21 @@
 #!/usr/bin/env python3
 import argparse
+import struct
 from pathlib import Path
 
 def bin_to_words_le(b: bytes) -> list[int]:
     # pad to multiple of 4
     if len(b) % 4:
         b += b"\x00" * (4 - (len(b) % 4))
-    words = []
-    for i in range(0, len(b), 4):
-        words.append(int.from_bytes(b[i:i+4], "little", signed=False))
-    return words
+    # one C-level unpack instead of a per-word int.from_bytes loop
+    return list(struct.unpack(f"<{len(b) // 4}I", b))
 
 def words_to_hex_lines(words: list[int]) -> str:
-    return "\n".join(f"{w:08x}" for w in words) + ("\n" if words else "")
+    if not words:
+        return ""
+    # pack big-endian so each word's hex digits come out MSB first,
+    # then let bytes.hex() insert the newline every 4 bytes
+    return struct.pack(f">{len(words)}I", *words).hex("\n", 4) + "\n"
 
 def main():
     ap = argparse.ArgumentParser()
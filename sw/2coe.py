@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
 import argparse
+import os
+import re
 from pathlib import Path
 
+# digit classes for the radixes a .coe file may declare
+DIGITS_RE = {
+    2:  re.compile(r"[01]+"),
+    10: re.compile(r"[0-9]+"),
+    16: re.compile(r"[0-9a-fA-F]+"),
+}
+
 def hex_to_coe(hex_path, out_dir, radix=16, word_width=None):
     hex_path = Path(hex_path)
     out_dir = Path(out_dir)
@@ -9,33 +18,39 @@ def hex_to_coe(hex_path, out_dir, radix=16, word_width=None):
 
     coe_path = out_dir / (hex_path.stem + ".coe")
 
-    values = []
-    with open(hex_path, "r") as f:
-        for i, line in enumerate(f):
-            line = line.strip()
-            if not line or line.startswith("#") or line.startswith("//"):
-                continue
-
-            if line.lower().startswith("0x"):
-                line = line[2:]
-
-            if word_width:
-                line = line.zfill(word_width)
-
-            try:
-                int(line, radix)
-            except ValueError:
-                raise ValueError(f"{hex_path}: invalid hex on line {i+1}: {line}")
-
-            values.append(line.lower())
-
-    with open(coe_path, "w") as f:
-        f.write(f"; Generated from {hex_path.name}\n")
-        f.write(f"memory_initialization_radix={radix};\n")
-        f.write("memory_initialization_vector=\n")
-        for i, v in enumerate(values):
-            f.write(v + (",\n" if i != len(values) - 1 else "\n"))
-        f.write(";\n")
+    digits_re = DIGITS_RE[radix]
+    # Single streaming pass: each value is written as soon as it is
+    # validated, with the separator emitted before every value but the first.
+    # Output goes to a sibling temp file that only replaces coe_path once the
+    # whole input has converted, so a failed run leaves any old .coe intact.
+    tmp_path = coe_path.with_name(coe_path.name + ".tmp")
+    try:
+        with open(hex_path, "r") as fin, open(tmp_path, "w") as fout:
+            fout.write(f"; Generated from {hex_path.name}\n"
+                       f"memory_initialization_radix={radix};\n"
+                       "memory_initialization_vector=\n")
+            sep = ""
+            for i, line in enumerate(fin):
+                line = line.strip()
+                if not line or line.startswith("#") or line.startswith("//"):
+                    continue
+
+                if line.lower().startswith("0x"):
+                    line = line[2:]
+
+                if word_width:
+                    line = line.zfill(word_width)
+
+                if not digits_re.fullmatch(line):
+                    raise ValueError(f"{hex_path}: invalid hex on line {i+1}: {line}")
+
+                fout.write(sep + line.lower())
+                sep = ",\n"
+            fout.write(("\n" if sep else "") + ";\n")
+        os.replace(tmp_path, coe_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
     print(f"[OK] {hex_path.name} → {coe_path}")
 
@@ -36,111 +36,113 @@ COE format:
 
 from __future__ import annotations
 import argparse
+import functools
 import glob
 import os
 import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 
-HEX_RE = re.compile(r'^[0-9a-fA-F]+$')
+# str.translate deletes every hex digit, so a token is hex iff nothing is left
+NON_HEX = str.maketrans('', '', '0123456789abcdefABCDEF')
+TOKEN_RE = re.compile(r'[^\s,]+')
+COMMENT_RE = re.compile(r'(?://|#).*')
 
-def parse_word32_line_to_bytes(line_hex: str, endian: str) -> List[int]:
+def parse_word32(line_hex: str) -> int:
     s = line_hex.strip()
     if s.startswith("0x") or s.startswith("0X"):
         s = s[2:]
-    # allow shorter than 8? left-pad to 8
+    # allow shorter than 8 (implicitly left-padded)
     if len(s) > 8:
         raise ValueError(f"Expected <=8 hex chars for 32-bit word, got {len(s)}: {s}")
-    s = s.zfill(8)
-    word = int(s, 16)
-    b0 = (word >> 0) & 0xFF
-    b1 = (word >> 8) & 0xFF
-    b2 = (word >> 16) & 0xFF
-    b3 = (word >> 24) & 0xFF
-    if endian == "little":
-        return [b0, b1, b2, b3]
-    else:
-        return [b3, b2, b1, b0]
+    return int(s, 16)
+
+def parse_word32_line_to_bytes(line_hex: str, endian: str) -> bytes:
+    return parse_word32(line_hex).to_bytes(4, "little" if endian == "little" else "big")
 
-def write_coe_byte_file(path: Path, byte_values: List[int]) -> None:
+def write_coe_byte_file(path: Path, byte_values: Sequence[int]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
+    # build the whole file in memory and hand it to the OS in one write
+    # bytes.hex() only takes a 1-char separator, so split on '\n' and widen it
+    body = bytes(byte_values).hex("\n").replace("\n", ",\n")
+    if body:
+        body += ";\n"
     with path.open("w", encoding="utf-8") as f:
-        f.write("memory_initialization_radix=16;\n")
-        f.write("memory_initialization_vector=\n")
-        n = len(byte_values)
-        for i, b in enumerate(byte_values):
-            sep = "," if i != n - 1 else ";"
-            f.write(f"{b:02x}{sep}\n")
+        f.write("memory_initialization_radix=16;\n"
+                "memory_initialization_vector=\n" + body)
 
 def read_hex_image_as_byte_stream(
     hex_path: Path,
     endian: str,
     addr_unit: str,
-) -> List[int]:
+) -> bytearray:
     """
     Returns a byte stream where directives can create holes (filled with 0).
     addr_unit:
       - "byte": @ADDR interpreted as byte address (default)
       - "word": @ADDR interpreted as 32-bit word address (ADDR*4 bytes)
     """
-    mem: List[int] = []
-    cur_byte_addr = 0
+    mem = bytearray()
+
+    # Words are parsed into runs of consecutive addresses; each run is then
+    # splatted into mem with a single struct.pack_into call.
+    fmt = "<" if endian == "little" else ">"
+    run: List[int] = []
+    run_start = 0
 
     def ensure_len(byte_addr: int) -> None:
-        nonlocal mem
         if byte_addr > len(mem):
-            mem.extend([0] * (byte_addr - len(mem)))
-
-    with hex_path.open("r", encoding="utf-8") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line:
-                continue
-            # strip comments (common styles)
-            line = line.split("//", 1)[0].split("#", 1)[0].strip()
-            if not line:
-                continue
-
-            if line.startswith("@"):
-                addr_hex = line[1:].strip()
-                if not addr_hex or not HEX_RE.match(addr_hex):
-                    raise ValueError(f"{hex_path}: bad address directive: {raw.rstrip()}")
-                addr = int(addr_hex, 16)
-                if addr_unit == "word":
-                    addr *= 4
-                cur_byte_addr = addr
-                ensure_len(cur_byte_addr)
+            mem.extend(bytes(byte_addr - len(mem)))
+
+    def flush_run() -> None:
+        if run:
+            ensure_len(run_start + 4 * len(run))
+            struct.pack_into(f"{fmt}{len(run)}I", mem, run_start, *run)
+            run.clear()
+
+    for raw in hex_path.read_text(encoding="utf-8").splitlines():
+        # strip comments (common styles) and surrounding whitespace
+        line = COMMENT_RE.sub("", raw, 1).strip()
+        if not line:
+            continue
+
+        if line.startswith("@"):
+            addr_hex = line[1:].strip()
+            if not addr_hex or addr_hex.translate(NON_HEX):
+                raise ValueError(f"{hex_path}: bad address directive: {raw.rstrip()}")
+            addr = int(addr_hex, 16)
+            if addr_unit == "word":
+                addr *= 4
+            flush_run()
+            run_start = addr
+            ensure_len(run_start)
+            continue
+
+        # Accept pure hex tokens; if line has multiple tokens, split and parse each
+        tokens = TOKEN_RE.findall(line)
+        for tok in tokens:
+            tok = tok.strip()
+            if tok.startswith("0x") or tok.startswith("0X"):
+                tok2 = tok[2:]
+            else:
+                tok2 = tok
+            if not tok2:
                 continue
+            if tok2.translate(NON_HEX):
+                # ignore weird tokens rather than crashing hard
+                raise ValueError(f"{hex_path}: non-hex token '{tok}' in line: {raw.rstrip()}")
+            # Treat each token as one 32-bit word (<=8 hex chars)
+            run.append(parse_word32(tok2))
 
-            # Accept pure hex tokens; if line has multiple tokens, split and parse each
-            tokens = line.replace(",", " ").split()
-            for tok in tokens:
-                tok = tok.strip()
-                if tok.startswith("0x") or tok.startswith("0X"):
-                    tok2 = tok[2:]
-                else:
-                    tok2 = tok
-                if not tok2:
-                    continue
-                if not HEX_RE.match(tok2):
-                    # ignore weird tokens rather than crashing hard
-                    raise ValueError(f"{hex_path}: non-hex token '{tok}' in line: {raw.rstrip()}")
-                # Treat each token as one 32-bit word (<=8 hex chars)
-                bytes_ = parse_word32_line_to_bytes(tok2, endian=endian)
-                ensure_len(cur_byte_addr)
-                # write bytes into mem at current address
-                ensure_len(cur_byte_addr + len(bytes_))
-                for b in bytes_:
-                    mem[cur_byte_addr] = b
-                    cur_byte_addr += 1
-
+    flush_run()
     return mem
 
-def split_into_8_banks(byte_stream: List[int]) -> List[List[int]]:
-    banks = [[] for _ in range(8)]
-    for idx, b in enumerate(byte_stream):
-        banks[idx % 8].append(b)
-    return banks
+def split_into_8_banks(byte_stream: bytes) -> List[memoryview]:
+    # strided views: bank i sees bytes i, i+8, i+16, ... without copying
+    mv = memoryview(byte_stream)
+    return [mv[i::8] for i in range(8)]
 
 def process_one(hex_file: Path, out_dir: Path, endian: str, addr_unit: str) -> None:
     byte_stream = read_hex_image_as_byte_stream(hex_file, endian=endian, addr_unit=addr_unit)
@@ -153,26 +155,28 @@ def process_one(hex_file: Path, out_dir: Path, endian: str, addr_unit: str) -> N
     print(f"[ok] {hex_file} -> {out_dir}/{stem}_bank0..7.coe  (bytes={len(byte_stream)})")
 
 def expand_inputs(inputs: List[str]) -> List[Path]:
-    files: List[Path] = []
+    # de-dup while preserving order; abspath is pure string work, unlike
+    # Path.resolve() which stats every component of every match
+    seen = set()
+    uniq: List[Path] = []
+
+    def add(m: str) -> None:
+        ap = os.path.abspath(m)
+        if ap not in seen:
+            seen.add(ap)
+            uniq.append(Path(m))
+
     for pat in inputs:
-        matches = glob.glob(pat)
-        if matches:
-            files.extend(Path(m) for m in matches)
-        else:
+        matched = False
+        for m in glob.iglob(pat):
+            matched = True
+            add(m)
+        if not matched:
             # allow direct path without glob expansion
-            p = Path(pat)
-            if p.exists():
-                files.append(p)
+            if os.path.exists(pat):
+                add(pat)
             else:
                 raise FileNotFoundError(f"No matches for: {pat}")
-    # de-dup while preserving order
-    seen = set()
-    uniq: List[Path] = []
-    for p in files:
-        rp = str(p.resolve())
-        if rp not in seen:
-            seen.add(rp)
-            uniq.append(p)
     return uniq
 
 def main() -> None:
@@ -185,12 +189,22 @@ def main() -> None:
                     help="How to interpret each 32-bit hex word line (default: little)")
     ap.add_argument("--addr-unit", choices=["byte", "word"], default="byte",
                     help="Meaning of @ADDR directives (default: byte)")
+    ap.add_argument("-j", "--jobs", type=int, default=0,
+                    help="Worker processes (default: one per CPU, 1 = serial)")
     args = ap.parse_args()
+    if args.jobs < 0:
+        ap.error("--jobs must be >= 0")
 
     out_dir = Path(args.out_dir)
     in_files = expand_inputs(args.inputs)
-    for hf in in_files:
-        process_one(hf, out_dir=out_dir, endian=args.endian, addr_unit=args.addr_unit)
+    work = functools.partial(process_one, out_dir=out_dir, endian=args.endian, addr_unit=args.addr_unit)
+    # each input is independent; only pay for a pool when there is more than one
+    if args.jobs == 1 or len(in_files) < 2:
+        for hf in in_files:
+            work(hf)
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs or None) as ex:
+            list(ex.map(work, in_files))
 
 if __name__ == "__main__":
     main()
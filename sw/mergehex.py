@@ -2,7 +2,8 @@ import sys
 
 def load_hex(path):
     with open(path) as f:
-        lines = [ln.strip() for ln in f if ln.strip() and not ln.startswith("//")]
+        text = f.read()
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip() and not ln.startswith("//")]
     # hexify.py typically emits one 32-bit word per line (check your format)
     return lines
 
@@ -3,94 +3,92 @@
 # Self-checking RV32I tests with commit trace golden reference generator
 
 from __future__ import annotations
+from array import array
+from collections.abc import Sequence
 from dataclasses import dataclass
-from typing import List, Dict, Callable, Tuple, Optional
+from functools import lru_cache, wraps
+from typing import List, Dict, Callable, NamedTuple, Tuple, Optional
 import argparse
+import struct
+import sys
 
-def mask(n, bits): return n & ((1 << bits) - 1)
-
+# The encoders are on the hot path of every Asm.emit, so each field is
+# masked with an inline constant.
 def encode_R(opcode, rd, funct3, rs1, rs2, funct7):
-    return ((mask(funct7,7) << 25) |
-            (mask(rs2,5)   << 20) |
-            (mask(rs1,5)   << 15) |
-            (mask(funct3,3)<< 12) |
-            (mask(rd,5)    << 7)  |
-            mask(opcode,7))
+    return (((funct7 & 0x7F) << 25) |
+            ((rs2 & 0x1F)    << 20) |
+            ((rs1 & 0x1F)    << 15) |
+            ((funct3 & 0x7)  << 12) |
+            ((rd & 0x1F)     << 7)  |
+            (opcode & 0x7F))
 
 def encode_I(opcode, rd, funct3, rs1, imm):
-    imm12 = mask(imm, 12)
-    return ((imm12          << 20) |
-            (mask(rs1,5)    << 15) |
-            (mask(funct3,3) << 12) |
-            (mask(rd,5)     << 7)  |
-            mask(opcode,7))
+    return (((imm & 0xFFF)   << 20) |
+            ((rs1 & 0x1F)    << 15) |
+            ((funct3 & 0x7)  << 12) |
+            ((rd & 0x1F)     << 7)  |
+            (opcode & 0x7F))
 
 def encode_U(opcode, rd, imm20):
-    return ((mask(imm20, 20) << 12) |
-            (mask(rd, 5)     << 7)  |
-            mask(opcode, 7))
+    return (((imm20 & 0xFFFFF) << 12) |
+            ((rd & 0x1F)       << 7)  |
+            (opcode & 0x7F))
 
 def encode_B(opcode, funct3, rs1, rs2, imm13):
     """Branch encoding - imm13 is signed byte offset (must be even)"""
-    imm = mask(imm13, 13)
-    imm_12   = (imm >> 12) & 0x1
-    imm_10_5 = (imm >> 5)  & 0x3F
-    imm_4_1  = (imm >> 1)  & 0xF
-    imm_11   = (imm >> 11) & 0x1
     return (
-        (imm_12 << 31) |
-        (imm_10_5 << 25) |
-        (mask(rs2, 5) << 20) |
-        (mask(rs1, 5) << 15) |
-        (mask(funct3, 3) << 12) |
-        (imm_4_1 << 8) |
-        (imm_11 << 7) |
-        mask(opcode, 7)
+        (((imm13 >> 12) & 0x1)  << 31) |    # imm[12]
+        (((imm13 >> 5)  & 0x3F) << 25) |    # imm[10:5]
+        ((rs2 & 0x1F)    << 20) |
+        ((rs1 & 0x1F)    << 15) |
+        ((funct3 & 0x7)  << 12) |
+        (((imm13 >> 1)  & 0xF)  << 8)  |    # imm[4:1]
+        (((imm13 >> 11) & 0x1)  << 7)  |    # imm[11]
+        (opcode & 0x7F)
     )
 
 def encode_J(opcode, rd, imm21):
     """JAL encoding - imm21 is signed byte offset (must be even)"""
-    imm = mask(imm21, 21)
-    imm_20    = (imm >> 20) & 0x1
-    imm_10_1  = (imm >> 1)  & 0x3FF
-    imm_11    = (imm >> 11) & 0x1
-    imm_19_12 = (imm >> 12) & 0xFF
     return (
-        (imm_20 << 31) |
-        (imm_10_1 << 21) |
-        (imm_11 << 20) |
-        (imm_19_12 << 12) |
-        (mask(rd, 5) << 7) |
-        mask(opcode, 7)
+        (((imm21 >> 20) & 0x1)   << 31) |   # imm[20]
+        (((imm21 >> 1)  & 0x3FF) << 21) |   # imm[10:1]
+        (((imm21 >> 11) & 0x1)   << 20) |   # imm[11]
+        (((imm21 >> 12) & 0xFF)  << 12) |   # imm[19:12]
+        ((rd & 0x1F) << 7) |
+        (opcode & 0x7F)
     )
 
 # Stores (opcode 0100011 = 0x23)  S-type encoding helper:
 def encode_S(opcode, funct3, rs1, rs2, imm12):
-    imm = mask(imm12, 12)
-    imm_11_5 = (imm >> 5) & 0x7F
-    imm_4_0  = imm & 0x1F
     return (
-        (imm_11_5 << 25) |
-        (mask(rs2, 5) << 20) |
-        (mask(rs1, 5) << 15) |
-        (mask(funct3, 3) << 12) |
-        (imm_4_0 << 7) |
-        mask(opcode, 7)
+        (((imm12 >> 5) & 0x7F) << 25) |     # imm[11:5]
+        ((rs2 & 0x1F)    << 20) |
+        ((rs1 & 0x1F)    << 15) |
+        ((funct3 & 0x7)  << 12) |
+        ((imm12 & 0x1F)  << 7)  |           # imm[4:0]
+        (opcode & 0x7F)
     )
 
 
 # Patchers for label fixups
+# Label fixups only replace the immediate bits of an already-encoded word,
+# so keep everything outside IMM_B_MASK / IMM_J_MASK and OR in the new offset.
+IMM_B_MASK = 0xFE000F80     # imm[12|10:5] in [31:25], imm[4:1|11] in [11:7]
+IMM_J_MASK = 0xFFFFF000     # imm[20|10:1|11|19:12] in [31:12]
+
 def patch_B(word: int, imm13: int) -> int:
-    opcode = word & 0x7F
-    rs1    = (word >> 15) & 0x1F
-    rs2    = (word >> 20) & 0x1F
-    funct3 = (word >> 12) & 0x7
-    return encode_B(opcode, funct3, rs1, rs2, imm13)
+    return ((word & ~IMM_B_MASK & 0xFFFFFFFF) |
+            (((imm13 >> 12) & 0x1)  << 31) |
+            (((imm13 >> 5)  & 0x3F) << 25) |
+            (((imm13 >> 1)  & 0xF)  << 8)  |
+            (((imm13 >> 11) & 0x1)  << 7))
 
 def patch_J(word: int, imm21: int) -> int:
-    opcode = word & 0x7F
-    rd     = (word >> 7) & 0x1F
-    return encode_J(opcode, rd, imm21)
+    return ((word & ~IMM_J_MASK & 0xFFFFFFFF) |
+            (((imm21 >> 20) & 0x1)   << 31) |
+            (((imm21 >> 1)  & 0x3FF) << 21) |
+            (((imm21 >> 11) & 0x1)   << 20) |
+            (((imm21 >> 12) & 0xFF)  << 12))
 
 # -------------------------
 # RV32I instruction encoders
@@ -156,6 +154,12 @@ def sext(val: int, bits: int) -> int:
     val &= (1 << bits) - 1
     return (val ^ sign) - sign
 
+# Sign-extension lookup tables for the fixed widths used by the decoder and
+# simulator: SEXTn[v & ((1 << n) - 1)] == sext(v, n).
+SEXT8  = tuple((v ^ 0x80) - 0x80 for v in range(1 << 8))
+SEXT12 = tuple((v ^ 0x800) - 0x800 for v in range(1 << 12))
+SEXT16 = tuple((v ^ 0x8000) - 0x8000 for v in range(1 << 16))
+
 def u32(x: int) -> int:
     return x & 0xFFFFFFFF
 
@@ -166,8 +170,10 @@ def s32(x: int) -> int:
 def x(r: int) -> str:
     return f"x{r}"
 
-def load_hex_words(path: str) -> List[int]:
-    words = []
+REG_NAMES = tuple(f"x{i}" for i in range(32))
+
+def load_hex_words(path: str) -> array:
+    words = array("I")
     with open(path, "r") as f:
         for line in f:
             line = line.strip()
@@ -177,130 +183,128 @@ def load_hex_words(path: str) -> List[int]:
             words.append(int(line, 16) & 0xFFFFFFFF)
     return words
 
-def imm_i(inst): return sext(inst >> 20, 12)
+def imm_i(inst): return SEXT12[(inst >> 20) & 0xFFF]
 
 def imm_s(inst):
     imm = ((inst >> 25) << 5) | ((inst >> 7) & 0x1F)
-    return sext(imm, 12)
+    return SEXT12[imm & 0xFFF]
 
+# B/J immediates are gathered with one shift+mask per field straight into
+# its final bit position, then sign-extended by subtracting twice the sign bit.
 def imm_b(inst):
-    imm = 0
-    imm |= ((inst >> 31) & 0x1) << 12
-    imm |= ((inst >> 7)  & 0x1) << 11
-    imm |= ((inst >> 25) & 0x3F) << 5
-    imm |= ((inst >> 8)  & 0xF) << 1
-    return sext(imm, 13)
+    imm = (((inst >> 19) & 0x1000) |    # inst[31]    -> imm[12]
+           ((inst << 4)  & 0x800)  |    # inst[7]     -> imm[11]
+           ((inst >> 20) & 0x7E0)  |    # inst[30:25] -> imm[10:5]
+           ((inst >> 7)  & 0x1E))       # inst[11:8]  -> imm[4:1]
+    return imm - ((imm & 0x1000) << 1)
 
 def imm_u(inst): return inst & 0xFFFFF000
 
 def imm_j(inst):
-    imm = 0
-    imm |= ((inst >> 31) & 0x1) << 20
-    imm |= ((inst >> 12) & 0xFF) << 12
-    imm |= ((inst >> 20) & 0x1) << 11
-    imm |= ((inst >> 21) & 0x3FF) << 1
-    return sext(imm, 21)
+    imm = (((inst >> 11) & 0x100000) |  # inst[31]    -> imm[20]
+           (inst & 0xFF000)          |  # inst[19:12] -> imm[19:12]
+           ((inst >> 9)  & 0x800)    |  # inst[20]    -> imm[11]
+           ((inst >> 20) & 0x7FE))      # inst[30:21] -> imm[10:1]
+    return imm - ((imm & 0x100000) << 1)
+
+# Decode tables: opcode -> leaf, or funct3 -> leaf, or funct3 -> funct7 -> leaf,
+# where a leaf is (handler, op, mnemonic). Each handler builds the Meta and
+# asm string for one instruction format.
+def _dec_u(inst, pc, op, mn, rd, rs1, rs2):
+    imm = (inst >> 12) & 0xFFFFF
+    return Meta(op, rd, 0, 0, imm), f"{mn} x{rd}, 0x{imm:x}"
+
+def _dec_j(inst, pc, op, mn, rd, rs1, rs2):
+    off = imm_j(inst)
+    return Meta(op, rd, 0, 0, 0, pc + off), f"{mn} x{rd}, {off:+d}"
+
+def _dec_jalr(inst, pc, op, mn, rd, rs1, rs2):
+    off = imm_i(inst)
+    return Meta(op, rd, rs1, 0, off, None), f"{mn} x{rd}, {off}(x{rs1})"
+
+def _dec_b(inst, pc, op, mn, rd, rs1, rs2):
+    off = imm_b(inst)
+    return Meta(op, 0, rs1, rs2, 0, pc + off), f"{mn} x{rs1}, x{rs2}, {off:+d}"
+
+def _dec_load(inst, pc, op, mn, rd, rs1, rs2):
+    off = imm_i(inst)
+    return Meta(op, rd, rs1, 0, off, None), f"{mn} x{rd}, {off}(x{rs1})"
+
+def _dec_store(inst, pc, op, mn, rd, rs1, rs2):
+    off = imm_s(inst)
+    return Meta(op, 0, rs1, rs2, off, None), f"{mn} x{rs2}, {off}(x{rs1})"
+
+def _dec_i(inst, pc, op, mn, rd, rs1, rs2):
+    off = imm_i(inst)
+    return Meta(op, rd, rs1, 0, off), f"{mn} x{rd}, x{rs1}, {off}"
+
+def _dec_shamt(inst, pc, op, mn, rd, rs1, rs2):
+    sh = (inst >> 20) & 0x1F
+    return Meta(op, rd, rs1, 0, sh), f"{mn} x{rd}, x{rs1}, {sh}"
+
+def _dec_r(inst, pc, op, mn, rd, rs1, rs2):
+    return Meta(op, rd, rs1, rs2, 0), f"{mn} x{rd}, x{rs1}, x{rs2}"
+
+def _leaf(handler, op):
+    return (handler, op, op.lower())
+
+DECODE_TABLE = {
+    0x37: _leaf(_dec_u, "LUI"),
+    0x17: _leaf(_dec_u, "AUIPC"),
+    0x6F: _leaf(_dec_j, "JAL"),
+    0x67: _leaf(_dec_jalr, "JALR"),
+    0x63: {0x0: _leaf(_dec_b, "BEQ"),  0x1: _leaf(_dec_b, "BNE"),
+           0x4: _leaf(_dec_b, "BLT"),  0x5: _leaf(_dec_b, "BGE"),
+           0x6: _leaf(_dec_b, "BLTU"), 0x7: _leaf(_dec_b, "BGEU")},
+    0x03: {0x0: _leaf(_dec_load, "LB"),  0x1: _leaf(_dec_load, "LH"),
+           0x2: _leaf(_dec_load, "LW"),  0x4: _leaf(_dec_load, "LBU"),
+           0x5: _leaf(_dec_load, "LHU")},
+    0x23: {0x0: _leaf(_dec_store, "SB"), 0x1: _leaf(_dec_store, "SH"),
+           0x2: _leaf(_dec_store, "SW")},
+    0x13: {0x0: _leaf(_dec_i, "ADDI"),  0x2: _leaf(_dec_i, "SLTI"),
+           0x3: _leaf(_dec_i, "SLTIU"), 0x4: _leaf(_dec_i, "XORI"),
+           0x6: _leaf(_dec_i, "ORI"),   0x7: _leaf(_dec_i, "ANDI"),
+           0x1: _leaf(_dec_shamt, "SLLI"),
+           0x5: {0x00: _leaf(_dec_shamt, "SRLI"), 0x20: _leaf(_dec_shamt, "SRAI")}},
+    0x33: {0x0: {0x00: _leaf(_dec_r, "ADD"), 0x20: _leaf(_dec_r, "SUB")},
+           0x1: {0x00: _leaf(_dec_r, "SLL")},
+           0x2: {0x00: _leaf(_dec_r, "SLT")},
+           0x3: {0x00: _leaf(_dec_r, "SLTU")},
+           0x4: {0x00: _leaf(_dec_r, "XOR")},
+           0x5: {0x00: _leaf(_dec_r, "SRL"), 0x20: _leaf(_dec_r, "SRA")},
+           0x6: {0x00: _leaf(_dec_r, "OR")},
+           0x7: {0x00: _leaf(_dec_r, "AND")}},
+}
 
 def decode_word(inst: int, pc: int) -> tuple[Meta, str]:
 
     if inst == 0:
-        return Meta("NOP", 0, 0, 0, 0, None), "nop"
+        return NOP_META, "nop"
 
     opcode = inst & 0x7F
-    rd     = (inst >> 7) & 0x1F
-    funct3 = (inst >> 12) & 0x7
-    rs1    = (inst >> 15) & 0x1F
-    rs2    = (inst >> 20) & 0x1F
-    funct7 = (inst >> 25) & 0x7F
-
-    # Defaults
-    m = Meta("NOP", 0, 0, 0, 0, None)
-    s = "nop"
-
-    if opcode == 0x37:  # LUI
-        m = Meta("LUI", rd, 0, 0, imm_u(inst) >> 12)
-        s = f"lui x{rd}, 0x{(imm_u(inst)>>12):x}"
-
-    elif opcode == 0x17:  # AUIPC
-        m = Meta("AUIPC", rd, 0, 0, imm_u(inst) >> 12)
-        s = f"auipc x{rd}, 0x{(imm_u(inst)>>12):x}"
-
-    elif opcode == 0x6F:  # JAL
-        off = imm_j(inst)
-        m = Meta("JAL", rd, 0, 0, 0, pc + off)
-        s = f"jal x{rd}, {off:+d}"
-
-    elif opcode == 0x67:  # JALR
-        off = imm_i(inst)
-        m = Meta("JALR", rd, rs1, 0, off, None)
-        s = f"jalr x{rd}, {off}(x{rs1})"
-
-    elif opcode == 0x63:  # BRANCH
-        off = imm_b(inst)
-        tgt = pc + off
-        opmap = {0x0:"BEQ",0x1:"BNE",0x4:"BLT",0x5:"BGE",0x6:"BLTU",0x7:"BGEU"}
-        op = opmap.get(funct3, None)
-        if op is None: raise RuntimeError(f"Unknown BR funct3={funct3} inst={inst:08x}")
-        m = Meta(op, 0, rs1, rs2, 0, tgt)
-        s = f"{op.lower()} x{rs1}, x{rs2}, {off:+d}"
-
-    elif opcode == 0x03:  # LOAD
-        off = imm_i(inst)
-        opmap = {0x0:"LB",0x1:"LH",0x2:"LW",0x4:"LBU",0x5:"LHU"}
-        op = opmap.get(funct3, None)
-        if op is None: raise RuntimeError(f"Unknown LD funct3={funct3} inst={inst:08x}")
-        m = Meta(op, rd, rs1, 0, off, None)
-        s = f"{op.lower()} x{rd}, {off}(x{rs1})"
-
-    elif opcode == 0x23:  # STORE
-        off = imm_s(inst)
-        opmap = {0x0:"SB",0x1:"SH",0x2:"SW"}
-        op = opmap.get(funct3, None)
-        if op is None: raise RuntimeError(f"Unknown ST funct3={funct3} inst={inst:08x}")
-        m = Meta(op, 0, rs1, rs2, off, None)
-        s = f"{op.lower()} x{rs2}, {off}(x{rs1})"
-
-    elif opcode == 0x13:  # OP-IMM
-        off = imm_i(inst)
-        if funct3 == 0x0: m,s = Meta("ADDI", rd, rs1, 0, off), f"addi x{rd}, x{rs1}, {off}"
-        elif funct3 == 0x2: m,s = Meta("SLTI", rd, rs1, 0, off), f"slti x{rd}, x{rs1}, {off}"
-        elif funct3 == 0x3: m,s = Meta("SLTIU", rd, rs1, 0, off), f"sltiu x{rd}, x{rs1}, {off}"
-        elif funct3 == 0x4: m,s = Meta("XORI", rd, rs1, 0, off), f"xori x{rd}, x{rs1}, {off}"
-        elif funct3 == 0x6: m,s = Meta("ORI", rd, rs1, 0, off), f"ori x{rd}, x{rs1}, {off}"
-        elif funct3 == 0x7: m,s = Meta("ANDI", rd, rs1, 0, off), f"andi x{rd}, x{rs1}, {off}"
-        elif funct3 == 0x1:  # SLLI
-            sh = (inst >> 20) & 0x1F
-            m,s = Meta("SLLI", rd, rs1, 0, sh), f"slli x{rd}, x{rs1}, {sh}"
-        elif funct3 == 0x5:
-            sh = (inst >> 20) & 0x1F
-            if funct7 == 0x00: m,s = Meta("SRLI", rd, rs1, 0, sh), f"srli x{rd}, x{rs1}, {sh}"
-            elif funct7 == 0x20: m,s = Meta("SRAI", rd, rs1, 0, sh), f"srai x{rd}, x{rs1}, {sh}"
-            else: raise RuntimeError(f"Bad shift imm inst={inst:08x}")
-        else:
-            raise RuntimeError(f"Unknown OP-IMM funct3={funct3} inst={inst:08x}")
-
-    elif opcode == 0x33:  # OP
-        key = (funct7, funct3)
-        if key == (0x00,0x0): m,s = Meta("ADD", rd, rs1, rs2, 0), f"add x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x20,0x0): m,s = Meta("SUB", rd, rs1, rs2, 0), f"sub x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x1): m,s = Meta("SLL", rd, rs1, rs2, 0), f"sll x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x2): m,s = Meta("SLT", rd, rs1, rs2, 0), f"slt x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x3): m,s = Meta("SLTU", rd, rs1, rs2, 0), f"sltu x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x4): m,s = Meta("XOR", rd, rs1, rs2, 0), f"xor x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x5): m,s = Meta("SRL", rd, rs1, rs2, 0), f"srl x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x20,0x5): m,s = Meta("SRA", rd, rs1, rs2, 0), f"sra x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x6): m,s = Meta("OR", rd, rs1, rs2, 0), f"or x{rd}, x{rs1}, x{rs2}"
-        elif key == (0x00,0x7): m,s = Meta("AND", rd, rs1, rs2, 0), f"and x{rd}, x{rs1}, x{rs2}"
-        else:
-            raise RuntimeError(f"Unknown OP key={key} inst={inst:08x}")
-
-    else:
+    t = DECODE_TABLE.get(opcode)
+    if t is None:
         raise RuntimeError(f"Unknown opcode=0x{opcode:x} inst={inst:08x}")
-
-    return m, s
+    if type(t) is dict:
+        funct3 = (inst >> 12) & 0x7
+        t = t.get(funct3)
+        if t is None:
+            raise RuntimeError(f"Unknown funct3={funct3} for opcode=0x{opcode:x} inst={inst:08x}")
+        if type(t) is dict:
+            funct7 = (inst >> 25) & 0x7F
+            t = t.get(funct7)
+            if t is None:
+                raise RuntimeError(f"Unknown funct7=0x{funct7:x} for opcode=0x{opcode:x} inst={inst:08x}")
+
+    handler, op, mn = t
+    return handler(inst, pc, op, mn,
+                   (inst >> 7) & 0x1F, (inst >> 15) & 0x1F, (inst >> 20) & 0x1F)
 
 def simulate_commit_trace_from_hex(hex_path: str, max_steps: int = 200000):
-    words = load_hex_words(hex_path)
+    return simulate_commit_trace_from_words(load_hex_words(hex_path), max_steps=max_steps)
+
+def simulate_commit_trace_from_words(words: List[int], max_steps: int = 200000):
+    """Same as simulate_commit_trace_from_hex, for an image already in memory."""
     # Create decoded meta/asm arrays aligned with word index
     meta = []
     asm  = []
@@ -318,7 +322,7 @@ def simulate_commit_trace_from_hex(hex_path: str, max_steps: int = 200000):
     return simulate_commit_trace(words, meta, asm, max_steps=max_steps)
 
 
-@dataclass
+@dataclass(slots=True)
 class Meta:
     op: str
     rd: int = 0
@@ -327,10 +331,15 @@ class Meta:
     imm: int = 0
     target_pc: Optional[int] = None  # For branches/jumps
 
+# Shared by every NOP / comment slot; only branch/JAL metas (target_pc) and
+# la metas (imm) are ever mutated, in Asm.finalize, so this one must stay
+# untouched.
+NOP_META = Meta("NOP", 0, 0, 0, 0, None)
+
 # -------------------------
 # Commit Trace Entry
 # -------------------------
-@dataclass
+@dataclass(slots=True)
 class CommitEntry:
     """Golden reference commit entry for OOO verification"""
     cycle: int          # Simulated cycle (for reference, actual OOO timing differs)
@@ -341,7 +350,8 @@ class CommitEntry:
     asm: str           # Assembly mnemonic for debug
     
     def __str__(self):
-        return f"[{self.cycle:6d}] PC={self.pc:08x} inst={self.inst:08x} rd=x{self.rd:02d} data={self.rd_data:08x}  # {self.asm}"
+        return "[%6d] PC=%08x inst=%08x rd=x%02d data=%08x  # %s" % (
+            self.cycle, self.pc, self.inst, self.rd, self.rd_data, self.asm)
     
     def to_dict(self):
         """For JSON export"""
@@ -354,12 +364,56 @@ class CommitEntry:
             'asm': self.asm
         }
 
+class CommitTrace(Sequence):
+    """
+    Commit trace stored as columns: the word index and rd value of each
+    committed step, plus per-word inst/rd/asm. Indexing or iterating builds
+    CommitEntry objects on demand; write_commit_trace reads rows() directly.
+    """
+    __slots__ = ("idx", "rd_data", "words", "rd", "asm")
+
+    def __init__(self, idx: List[int], rd_data: List[int], words, rd: List[int], asm: List[str]):
+        self.idx = idx          # per step: word index (pc >> 2)
+        self.rd_data = rd_data  # per step: committed rd value (0 if rd=0)
+        self.words = words      # per word: instruction encoding
+        self.rd = rd            # per word: destination register
+        self.asm = asm          # per word: assembly text
+
+    def __len__(self):
+        return len(self.idx)
+
+    def _entry(self, cycle: int) -> CommitEntry:
+        i = self.idx[cycle]
+        return CommitEntry(cycle, i * 4, self.words[i], self.rd[i], self.rd_data[cycle], self.asm[i])
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self._entry(c) for c in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("commit trace index out of range")
+        return self._entry(k)
+
+    def __iter__(self):
+        for row in self.rows():
+            yield CommitEntry(*row)
+
+    def rows(self):
+        """(cycle, pc, inst, rd, rd_data, asm) tuples, without CommitEntry objects"""
+        words, rd, asm = self.words, self.rd, self.asm
+        for cycle, (i, d) in enumerate(zip(self.idx, self.rd_data)):
+            yield cycle, i * 4, words[i], rd[i], d, asm[i]
+
 # -------------------------
 # Enhanced Assembler with self-check utilities
 # -------------------------
 class Asm:
-    def __init__(self):
-        self.words: List[int] = []
+    def __init__(self, emit_asm: bool = True):
+        # emit_asm=False leaves the asm listing empty (not one "" per word),
+        # for hex-only output; words and meta stay index-aligned either way
+        self.emit_asm = emit_asm
+        self.words: array = array("I")  # packed uint32 instruction words
         self.asm:   List[str] = []
         self.meta:  List[Meta] = []
         self.labels: Dict[str, int] = {}
@@ -368,135 +422,162 @@ class Asm:
     def pc(self) -> int:
         return 4 * len(self.words)
 
+    def emit_block(self, block: AsmBlock, repeat: int = 1):
+        """Splice in a pre-assembled AsmBlock (see asm_block) repeat times"""
+        self.words.extend(block.words * repeat)
+        if self.emit_asm:
+            self.asm.extend(block.asm * repeat)
+        self.meta.extend(block.meta * repeat)
+
     def emit(self, w: int, asm: str, meta: Meta):
         self.words.append(w & 0xFFFFFFFF)
-        self.asm.append(asm)
+        if self.emit_asm:
+            self.asm.append(asm)
+        self.meta.append(meta)
+
+    def _emit_fmt(self, w: int, fmt: str, args: tuple, meta: Meta):
+        """emit() with the listing text formatted only if emit_asm is set"""
+        self.words.append(w & 0xFFFFFFFF)
+        if self.emit_asm:
+            self.asm.append(fmt % args)
         self.meta.append(meta)
 
     # U-type
     def lui(self, rd, imm20):
-        self.emit(LUI(rd, imm20), f"lui  {x(rd)}, 0x{imm20 & 0xFFFFF:x}", 
+        self._emit_fmt(LUI(rd, imm20), "lui  %s, 0x%x", (REG_NAMES[rd], imm20 & 0xFFFFF), 
                   Meta("LUI", rd, 0, 0, imm20))
     
     def auipc(self, rd, imm20):
-        self.emit(AUIPC(rd, imm20), f"auipc {x(rd)}, 0x{imm20 & 0xFFFFF:x}", 
+        self._emit_fmt(AUIPC(rd, imm20), "auipc %s, 0x%x", (REG_NAMES[rd], imm20 & 0xFFFFF), 
                   Meta("AUIPC", rd, 0, 0, imm20))
 
     # I-type
     def addi(self, rd, rs1, imm): 
-        self.emit(ADDI(rd, rs1, imm), f"addi {x(rd)}, {x(rs1)}, {imm}", 
+        self._emit_fmt(ADDI(rd, rs1, imm), "addi %s, %s, %d", (REG_NAMES[rd], REG_NAMES[rs1], imm), 
                   Meta("ADDI", rd, rs1, 0, imm))
     
     def andi(self, rd, rs1, imm):
-        s = f"andi {x(rd)}, {x(rs1)}, 0x{imm & 0xFFF:x}" if imm >= 0 else f"andi {x(rd)}, {x(rs1)}, {imm}"
-        self.emit(ANDI(rd, rs1, imm), s, Meta("ANDI", rd, rs1, 0, imm))
+        if imm >= 0:
+            fmt, v = "andi %s, %s, 0x%x", imm & 0xFFF
+        else:
+            fmt, v = "andi %s, %s, %d", imm
+        self._emit_fmt(ANDI(rd, rs1, imm), fmt, (REG_NAMES[rd], REG_NAMES[rs1], v),
+                       Meta("ANDI", rd, rs1, 0, imm))
     
     def ori(self, rd, rs1, imm):
-        s = f"ori  {x(rd)}, {x(rs1)}, 0x{imm & 0xFFF:x}" if imm >= 0 else f"ori  {x(rd)}, {x(rs1)}, {imm}"
-        self.emit(ORI(rd, rs1, imm), s, Meta("ORI", rd, rs1, 0, imm))
+        if imm >= 0:
+            fmt, v = "ori  %s, %s, 0x%x", imm & 0xFFF
+        else:
+            fmt, v = "ori  %s, %s, %d", imm
+        self._emit_fmt(ORI(rd, rs1, imm), fmt, (REG_NAMES[rd], REG_NAMES[rs1], v),
+                       Meta("ORI", rd, rs1, 0, imm))
     
     def xori(self, rd, rs1, imm):
-        s = f"xori {x(rd)}, {x(rs1)}, 0x{imm & 0xFFF:x}" if imm >= 0 else f"xori {x(rd)}, {x(rs1)}, {imm}"
-        self.emit(XORI(rd, rs1, imm), s, Meta("XORI", rd, rs1, 0, imm))
+        if imm >= 0:
+            fmt, v = "xori %s, %s, 0x%x", imm & 0xFFF
+        else:
+            fmt, v = "xori %s, %s, %d", imm
+        self._emit_fmt(XORI(rd, rs1, imm), fmt, (REG_NAMES[rd], REG_NAMES[rs1], v),
+                       Meta("XORI", rd, rs1, 0, imm))
     
     def slti(self, rd, rs1, imm): 
-        self.emit(SLTI(rd, rs1, imm), f"slti {x(rd)}, {x(rs1)}, {imm}", 
+        self._emit_fmt(SLTI(rd, rs1, imm), "slti %s, %s, %d", (REG_NAMES[rd], REG_NAMES[rs1], imm), 
                   Meta("SLTI", rd, rs1, 0, imm))
     
     def sltiu(self, rd, rs1, imm): 
-        self.emit(SLTIU(rd, rs1, imm), f"sltiu {x(rd)}, {x(rs1)}, {imm}", 
+        self._emit_fmt(SLTIU(rd, rs1, imm), "sltiu %s, %s, %d", (REG_NAMES[rd], REG_NAMES[rs1], imm), 
                   Meta("SLTIU", rd, rs1, 0, imm))
     
     def slli(self, rd, rs1, sh):  
-        self.emit(SLLI(rd, rs1, sh), f"slli {x(rd)}, {x(rs1)}, {sh}", 
+        self._emit_fmt(SLLI(rd, rs1, sh), "slli %s, %s, %d", (REG_NAMES[rd], REG_NAMES[rs1], sh), 
                   Meta("SLLI", rd, rs1, 0, sh))
     
     def srli(self, rd, rs1, sh):  
-        self.emit(SRLI(rd, rs1, sh), f"srli {x(rd)}, {x(rs1)}, {sh}", 
+        self._emit_fmt(SRLI(rd, rs1, sh), "srli %s, %s, %d", (REG_NAMES[rd], REG_NAMES[rs1], sh), 
                   Meta("SRLI", rd, rs1, 0, sh))
     
     def srai(self, rd, rs1, sh):  
-        self.emit(SRAI(rd, rs1, sh), f"srai {x(rd)}, {x(rs1)}, {sh}", 
+        self._emit_fmt(SRAI(rd, rs1, sh), "srai %s, %s, %d", (REG_NAMES[rd], REG_NAMES[rs1], sh), 
                   Meta("SRAI", rd, rs1, 0, sh))
 
     # R-type
     def add(self, rd, rs1, rs2):  
-        self.emit(ADD(rd, rs1, rs2), f"add  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(ADD(rd, rs1, rs2), "add  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("ADD", rd, rs1, rs2, 0))
     
     def sub(self, rd, rs1, rs2):  
-        self.emit(SUB(rd, rs1, rs2), f"sub  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(SUB(rd, rs1, rs2), "sub  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("SUB", rd, rs1, rs2, 0))
     
     def _and(self, rd, rs1, rs2): 
-        self.emit(AND(rd, rs1, rs2), f"and  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(AND(rd, rs1, rs2), "and  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("AND", rd, rs1, rs2, 0))
     
     def _or(self, rd, rs1, rs2):  
-        self.emit(OR(rd, rs1, rs2), f"or   {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(OR(rd, rs1, rs2), "or   %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("OR",  rd, rs1, rs2, 0))
     
     def _xor(self, rd, rs1, rs2): 
-        self.emit(XOR(rd, rs1, rs2), f"xor  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(XOR(rd, rs1, rs2), "xor  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("XOR", rd, rs1, rs2, 0))
     
     def sll(self, rd, rs1, rs2):  
-        self.emit(SLL(rd, rs1, rs2), f"sll  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(SLL(rd, rs1, rs2), "sll  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("SLL", rd, rs1, rs2, 0))
     
     def srl(self, rd, rs1, rs2):  
-        self.emit(SRL(rd, rs1, rs2), f"srl  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(SRL(rd, rs1, rs2), "srl  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("SRL", rd, rs1, rs2, 0))
     
     def sra(self, rd, rs1, rs2):  
-        self.emit(SRA(rd, rs1, rs2), f"sra  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(SRA(rd, rs1, rs2), "sra  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("SRA", rd, rs1, rs2, 0))
     
     def slt(self, rd, rs1, rs2):  
-        self.emit(SLT(rd, rs1, rs2), f"slt  {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(SLT(rd, rs1, rs2), "slt  %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("SLT", rd, rs1, rs2, 0))
     
     def sltu(self, rd, rs1, rs2): 
-        self.emit(SLTU(rd, rs1, rs2), f"sltu {x(rd)}, {x(rs1)}, {x(rs2)}", 
+        self._emit_fmt(SLTU(rd, rs1, rs2), "sltu %s, %s, %s", (REG_NAMES[rd], REG_NAMES[rs1], REG_NAMES[rs2]), 
                   Meta("SLTU", rd, rs1, rs2, 0))
         
 
     # Loads
     def lb(self, rd, rs1, imm):
-        self.emit(LB(rd, rs1, imm), f"lb   {x(rd)}, {imm}({x(rs1)})",
+        self._emit_fmt(LB(rd, rs1, imm), "lb   %s, %d(%s)", (REG_NAMES[rd], imm, REG_NAMES[rs1]),
                 Meta("LB", rd, rs1, 0, imm))
 
     def lbu(self, rd, rs1, imm):
-        self.emit(LBU(rd, rs1, imm), f"lbu  {x(rd)}, {imm}({x(rs1)})",
+        self._emit_fmt(LBU(rd, rs1, imm), "lbu  %s, %d(%s)", (REG_NAMES[rd], imm, REG_NAMES[rs1]),
                 Meta("LBU", rd, rs1, 0, imm))
 
     def lh(self, rd, rs1, imm):
-        self.emit(LH(rd, rs1, imm), f"lh   {x(rd)}, {imm}({x(rs1)})",
+        self._emit_fmt(LH(rd, rs1, imm), "lh   %s, %d(%s)", (REG_NAMES[rd], imm, REG_NAMES[rs1]),
                 Meta("LH", rd, rs1, 0, imm))
 
     def lhu(self, rd, rs1, imm):
-        self.emit(LHU(rd, rs1, imm), f"lhu  {x(rd)}, {imm}({x(rs1)})",
+        self._emit_fmt(LHU(rd, rs1, imm), "lhu  %s, %d(%s)", (REG_NAMES[rd], imm, REG_NAMES[rs1]),
                 Meta("LHU", rd, rs1, 0, imm))
 
     def lw(self, rd, rs1, imm):
-        self.emit(LW(rd, rs1, imm), f"lw   {x(rd)}, {imm}({x(rs1)})",
+        self._emit_fmt(LW(rd, rs1, imm), "lw   %s, %d(%s)", (REG_NAMES[rd], imm, REG_NAMES[rs1]),
                 Meta("LW", rd, rs1, 0, imm))
 
     # Stores
     def sb(self, rs2, rs1, imm):
-        self.emit(SB(rs2, rs1, imm), f"sb   {x(rs2)}, {imm}({x(rs1)})",
+        self._emit_fmt(SB(rs2, rs1, imm), "sb   %s, %d(%s)", (REG_NAMES[rs2], imm, REG_NAMES[rs1]),
                 Meta("SB", 0, rs1, rs2, imm))
 
     def sh(self, rs2, rs1, imm):
-        self.emit(SH(rs2, rs1, imm), f"sh   {x(rs2)}, {imm}({x(rs1)})",
+        self._emit_fmt(SH(rs2, rs1, imm), "sh   %s, %d(%s)", (REG_NAMES[rs2], imm, REG_NAMES[rs1]),
                 Meta("SH", 0, rs1, rs2, imm))
 
     def sw(self, rs2, rs1, imm):
-        self.emit(SW(rs2, rs1, imm), f"sw   {x(rs2)}, {imm}({x(rs1)})",
+        self._emit_fmt(SW(rs2, rs1, imm), "sw   %s, %d(%s)", (REG_NAMES[rs2], imm, REG_NAMES[rs1]),
                 Meta("SW", 0, rs1, rs2, imm))
 
     def nop(self): 
-        self.emit(NOP(), "nop", Meta("NOP"))
+        self._emit_fmt(NOP(), "nop", (), NOP_META)
 
     # -------------------------
     # Label support for branches/jumps
@@ -512,14 +593,14 @@ class Asm:
         """Helper for branch instructions with label fixup"""
         idx = len(self.words)
         self.fixups.append((idx, "B", (op, label, enc_fn)))
-        self.emit(enc_fn(rs1, rs2, 0), f"{asm_mn} {x(rs1)}, {x(rs2)}, {label}",
+        self._emit_fmt(enc_fn(rs1, rs2, 0), "%s %s, %s, %s", (asm_mn, REG_NAMES[rs1], REG_NAMES[rs2], label),
                   Meta(op, 0, rs1, rs2, 0))
 
     def _fixup_J(self, rd: int, label: str):
         """Helper for JAL instruction with label fixup"""
         idx = len(self.words)
         self.fixups.append((idx, "J", (label,)))
-        self.emit(JAL(rd, 0), f"jal  {x(rd)}, {label}",
+        self._emit_fmt(JAL(rd, 0), "jal  %s, %s", (REG_NAMES[rd], label),
                   Meta("JAL", rd, 0, 0, 0))
 
     # Branch instructions
@@ -545,8 +626,17 @@ class Asm:
     def jal(self, rd: int, label: str):
         self._fixup_J(rd, label)
     
+    def la(self, rd: int, label: str):
+        """Load a label's address PC-relatively (auipc + addi, patched in finalize)"""
+        idx = len(self.words)
+        self.fixups.append((idx, "LA", (rd, label)))
+        self._emit_fmt(AUIPC(rd, 0), "auipc %s, %%pcrel_hi(%s)", (REG_NAMES[rd], label),
+                  Meta("AUIPC", rd, 0, 0, 0))
+        self._emit_fmt(ADDI(rd, rd, 0), "addi %s, %s, %%pcrel_lo(%s)", (REG_NAMES[rd], REG_NAMES[rd], label),
+                  Meta("ADDI", rd, rd, 0, 0))
+    
     def jalr(self, rd: int, rs1: int, imm: int):
-        self.emit(JALR(rd, rs1, imm), f"jalr {x(rd)}, {imm}({x(rs1)})",
+        self._emit_fmt(JALR(rd, rs1, imm), "jalr %s, %d(%s)", (REG_NAMES[rd], imm, REG_NAMES[rs1]),
                   Meta("JALR", rd, rs1, 0, imm))
 
     def finalize(self):
@@ -575,6 +665,17 @@ class Asm:
                     raise ValueError(f"JAL target not aligned: {label}")
                 self.words[idx] = patch_J(self.words[idx], off)
                 self.meta[idx].target_pc = tgt
+            elif kind == "LA":
+                rd, label = args
+                if label not in self.labels:
+                    raise ValueError(f"Undefined label '{label}'")
+                off = self.labels[label] - idx * 4   # relative to the auipc
+                hi = ((off + 0x800) >> 12) & 0xFFFFF
+                lo = SEXT12[off & 0xFFF]
+                self.words[idx] = AUIPC(rd, hi)
+                self.meta[idx].imm = hi
+                self.words[idx + 1] = ADDI(rd, rd, lo)
+                self.meta[idx + 1].imm = lo
 
     # -------------------------
     # Self-check utilities
@@ -582,23 +683,22 @@ class Asm:
     
     def li(self, rd: int, imm32: int, comment: str = ""):
         """Load 32-bit immediate using LUI + ORI/ADDI"""
-        imm32 = u32(imm32)
-        upper = (imm32 >> 12) & 0xFFFFF
-        lower = imm32 & 0xFFF
-        
-        # Handle sign extension of lower 12 bits
-        if lower & 0x800:  # If bit 11 is set, ADDI will sign-extend
-            upper = (upper + 1) & 0xFFFFF
+        imm32 &= 0xFFFFFFFF
+        # ADDI sign-extends its 12-bit immediate; rounding by 0x800 before
+        # taking the upper 20 bits pre-compensates LUI for that.
+        lower = SEXT12[imm32 & 0xFFF]
+        upper = ((imm32 + 0x800) >> 12) & 0xFFFFF
         
         if comment:
-            self.emit(NOP(), f"# li {x(rd)}, 0x{imm32:08x} - {comment}", Meta("NOP"))
+            self._emit_fmt(NOP(), "# li %s, 0x%08x - %s", (REG_NAMES[rd], imm32, comment), NOP_META)
         
-        if upper != 0:
+        if upper == 0:
+            # Fits in a sign-extended 12-bit immediate: no LUI needed
+            self.addi(rd, 0, lower)
+        else:
             self.lui(rd, upper)
             if lower != 0:
-                self.addi(rd, rd, sext(lower, 12))
-        else:
-            self.addi(rd, 0, sext(lower, 12))
+                self.addi(rd, rd, lower)
 
     def check_reg(self, reg: int, expected: int, fail_bit: int):
         """
@@ -607,36 +707,64 @@ class Asm:
         Uses x28, x29, x30 as scratch.
         """
         expected = u32(expected)
+        simm = SEXT12[expected & 0xFFF]
         
-        # Load expected value into x28
-        self.li(28, expected, f"expected {x(reg)}=0x{expected:08x}")
-        
-        # XOR to find difference
-        self._xor(29, reg, 28)  # x29 = reg ^ expected
-        
-        # Convert non-zero to 1
-        self.sltu(29, 0, 29)  # x29 = (0 < x29) ? 1 : 0
-        
-        # Shift to fail_bit position
-        if fail_bit > 0:
-            self.slli(29, 29, fail_bit)
+        if expected == 0:
+            # reg itself is the difference
+            self.sltu(29, 0, reg)  # x29 = (0 < reg) ? 1 : 0
+        else:
+            if u32(simm) == expected:
+                # Fits a sign-extended 12-bit immediate: no need for x28
+                self.xori(29, reg, simm)  # x29 = reg ^ expected
+            else:
+                # Load expected value into x28
+                self.li(28, expected, f"expected {REG_NAMES[reg]}=0x{expected:08x}")
+                
+                # XOR to find difference
+                self._xor(29, reg, 28)  # x29 = reg ^ expected
         
-        # Accumulate into x31
-        self._or(31, 31, 29)
+        # Convert non-zero to 1, shift to fail_bit and accumulate into x31;
+        # this tail only depends on fail_bit, so it is spliced pre-assembled
+        self.emit_block(_check_tail(fail_bit, expected != 0))
         
-        self.emit(NOP(), f"# check x{reg}==0x{expected:08x} (bit {fail_bit})", Meta("NOP"))
+        self._emit_fmt(NOP(), "# check x%d==0x%08x (bit %d)", (reg, expected, fail_bit), NOP_META)
 
+    # -------------------------
+    # Test-data helpers (expand to plain li/sw/lw/check_reg sequences)
+    # -------------------------
+    def store_imm(self, val: int, base: int, off: int, tmp: int = 1, comment: str = ""):
+        """Store a 32-bit constant: li tmp, val; sw tmp, off(base)"""
+        self.li(tmp, val, comment)
+        self.sw(tmp, base, off)
+
+    def store_words(self, base: int, vals, off: int = 0, tmp: int = 1):
+        """Store vals as consecutive words from off(base), one li + sw each"""
+        self.emit_block(_store_words_block(base, tuple(vals), off, tmp))
+
+    def load_check(self, rd: int, base: int, off: int, expected: int, fail_bit: int):
+        """lw rd, off(base), then check_reg(rd, expected, fail_bit)"""
+        self.lw(rd, base, off)
+        self.check_reg(rd, expected, fail_bit)
+
+    # The prologue/epilogue are the same for every test (per expected_x31),
+    # so they are assembled once and spliced from _frame_block.
     def init_test(self):
         """Initialize test - clear x31 (pass/fail accumulator)"""
-        self.addi(31, 0, 0)
-        self.emit(NOP(), "# === TEST START ===", Meta("NOP"))
+        self.emit_block(_frame_block(None))
 
     def finalize_test(self, expected_x31: int = 0):
         """
         Finalize test - x31 should equal expected_x31 (usually 0 for pass).
         Stores final pass/fail in x30.
         """
-        self.emit(NOP(), f"# === TEST END (expect x31=0x{expected_x31:08x}) ===", Meta("NOP"))
+        self.emit_block(_frame_block(expected_x31))
+
+    def _init_test_seq(self):
+        self.addi(31, 0, 0)
+        self._emit_fmt(NOP(), "# === TEST START ===", (), NOP_META)
+
+    def _finalize_test_seq(self, expected_x31: int):
+        self._emit_fmt(NOP(), "# === TEST END (expect x31=0x%08x) ===", (expected_x31,), NOP_META)
         
         # x30 = (x31 == expected_x31) ? 0xPASS : 0xFAIL
         self.li(28, expected_x31, "expected x31")
@@ -647,244 +775,541 @@ class Asm:
         # x30 = final status marker
         self.li(30, 0xDEADBEEF if expected_x31 == 0 else 0x0BADC0DE, "status")
 
-def mem_write_byte(mem: dict[int,int], addr: int, val: int):
-    mem[addr & 0xFFFFFFFF] = val & 0xFF
-
-def mem_read_byte(mem: dict[int,int], addr: int) -> int:
-    return mem.get(addr & 0xFFFFFFFF, 0)
-
-def mem_write(mem: dict[int,int], addr: int, size: int, val: int):
+@dataclass(frozen=True, slots=True)
+class AsmBlock:
+    """A label-free instruction sequence assembled once, for Asm.emit_block"""
+    words: Tuple[int, ...]
+    asm: Tuple[str, ...]
+    meta: Tuple[Meta, ...]   # shared by every splice; never branch/JAL metas
+
+def asm_block(build: Callable[[Asm], None]) -> AsmBlock:
+    """Run build on a scratch Asm and freeze the result as an AsmBlock"""
+    s = Asm()
+    build(s)
+    if s.labels or s.fixups:
+        raise ValueError("asm_block sequences cannot use labels")
+    return AsmBlock(tuple(s.words), tuple(s.asm), tuple(s.meta))
+
+@lru_cache(maxsize=None)
+def _frame_block(expected_x31: Optional[int]) -> AsmBlock:
+    """init_test's prologue (None) or finalize_test's epilogue for expected_x31"""
+    if expected_x31 is None:
+        return asm_block(Asm._init_test_seq)
+    return asm_block(lambda s: s._finalize_test_seq(expected_x31))
+
+@lru_cache(maxsize=None)
+def _check_tail(fail_bit: int, normalize: bool) -> AsmBlock:
+    """check_reg's x29 -> x31 accumulation for one fail bit"""
+    def build(s: Asm):
+        if normalize:
+            s.sltu(29, 0, 29)  # x29 = (0 < x29) ? 1 : 0
+        if fail_bit > 0:
+            s.slli(29, 29, fail_bit)
+        s._or(31, 31, 29)
+    return asm_block(build)
+
+@lru_cache(maxsize=None)
+def _store_words_block(base: int, vals: Tuple[int, ...], off: int, tmp: int) -> AsmBlock:
+    """store_words' li/sw pairs, assembled once per (base, vals, off, tmp)"""
+    def build(s: Asm):
+        o = off
+        for v in vals:
+            s.li(tmp, v)
+            s.sw(tmp, base, o)
+            o += 4
+    return asm_block(build)
+
+def cached_program(fn: Callable[[Asm], None]) -> Callable[[Asm], None]:
+    """
+    For test bodies fully determined at import time (no labels, no data-
+    dependent loops): record fn once as an AsmBlock, then replay it with
+    emit_block. Labelled bodies raise on first use; leave those undecorated.
+    """
+    block: Optional[AsmBlock] = None
+
+    @wraps(fn)
+    def replay(a: Asm):
+        nonlocal block
+        if block is None:
+            block = asm_block(fn)
+        a.emit_block(block)
+    return replay
+
+# Data memory is sparse: 64 KiB pages keyed by addr >> MEM_PAGE_BITS,
+# allocated on first write. Unwritten bytes read as 0.
+MEM_PAGE_BITS = 16
+MEM_PAGE_SIZE = 1 << MEM_PAGE_BITS
+MEM_PAGE_MASK = MEM_PAGE_SIZE - 1
+
+# Little-endian 1/2/4-byte accessors: one C call per in-page load/store
+_MEM_UNPACK = {n: struct.Struct(f"<{c}").unpack_from for n, c in ((1, "B"), (2, "H"), (4, "I"))}
+_MEM_PACK   = {n: struct.Struct(f"<{c}").pack_into for n, c in ((1, "B"), (2, "H"), (4, "I"))}
+_MEM_VMASK  = {1: 0xFF, 2: 0xFFFF, 4: 0xFFFFFFFF}
+
+# Naturally aligned halfword/word accesses index native-order casts of the
+# page, which only matches RISC-V (little-endian) memory on LE hosts.
+_MEM_ALIGNED_VIEWS = sys.byteorder == "little"
+
+def _mem_new_page() -> tuple:
+    """A zeroed page as views indexed by access size: page[1|2|4]"""
+    b = memoryview(bytearray(MEM_PAGE_SIZE))
+    return (None, b, b.cast("H"), None, b.cast("I"))
+
+def mem_write(mem: dict[int,tuple], addr: int, size: int, val: int):
     # little-endian
-    for i in range(size):
-        mem_write_byte(mem, addr + i, val >> (8*i))
-
-def mem_read(mem: dict[int,int], addr: int, size: int) -> int:
+    addr &= 0xFFFFFFFF
+    off = addr & MEM_PAGE_MASK
+    if off + size <= MEM_PAGE_SIZE:
+        page = mem.get(addr >> MEM_PAGE_BITS)
+        if page is None:
+            page = mem[addr >> MEM_PAGE_BITS] = _mem_new_page()
+        if size == 1 or (_MEM_ALIGNED_VIEWS and not off & (size - 1)):
+            page[size][off >> (size >> 1)] = val & _MEM_VMASK[size]
+        else:
+            _MEM_PACK[size](page[1], off, val & _MEM_VMASK[size])
+    else:
+        # Straddles a page boundary (or wraps at 4 GiB): split into bytes
+        for i in range(size):
+            mem_write(mem, addr + i, 1, val >> (8*i))
+
+def mem_read(mem: dict[int,tuple], addr: int, size: int) -> int:
+    addr &= 0xFFFFFFFF
+    off = addr & MEM_PAGE_MASK
+    if off + size <= MEM_PAGE_SIZE:
+        page = mem.get(addr >> MEM_PAGE_BITS)
+        if page is None:
+            return 0
+        if size == 1 or (_MEM_ALIGNED_VIEWS and not off & (size - 1)):
+            return page[size][off >> (size >> 1)]
+        return _MEM_UNPACK[size](page[1], off)[0]
     v = 0
     for i in range(size):
-        v |= (mem_read_byte(mem, addr + i) << (8*i))
+        v |= (mem_read(mem, addr + i, 1) << (8*i))
     return v
 
 
+# -------------------------
+# Instruction semantics
+# -------------------------
+# One handler per op: (pc, rs1 value, rs2 value, imm, target_pc, mem)
+# -> (rd_data, next_pc). Register values and rd_data are u32, and imm has
+# been folded at pre-decode time by fold_imm (sign-extended, shifted or masked
+# to the value the op consumes).
+# Handlers avoid helper calls: u32() is written as & 0xFFFFFFFF and signed
+# compares flip the sign bit ((a ^ 0x80000000) orders like s32(a)).
+def _ex_nop(pc, a, b, imm, tgt, mem):   return 0, pc + 4
+def _ex_lui(pc, a, b, imm, tgt, mem):   return imm, pc + 4
+def _ex_auipc(pc, a, b, imm, tgt, mem): return (pc + imm) & 0xFFFFFFFF, pc + 4
+
+def _ex_addi(pc, a, b, imm, tgt, mem):  return (a + imm) & 0xFFFFFFFF, pc + 4
+def _ex_slti(pc, a, b, imm, tgt, mem):  return (1 if (a ^ 0x80000000) - 0x80000000 < imm else 0), pc + 4
+def _ex_sltiu(pc, a, b, imm, tgt, mem): return (1 if a < (imm & 0xFFFFFFFF) else 0), pc + 4
+def _ex_xori(pc, a, b, imm, tgt, mem):  return (a ^ imm) & 0xFFFFFFFF, pc + 4
+def _ex_ori(pc, a, b, imm, tgt, mem):   return (a | imm) & 0xFFFFFFFF, pc + 4
+def _ex_andi(pc, a, b, imm, tgt, mem):  return a & imm, pc + 4
+def _ex_slli(pc, a, b, imm, tgt, mem):  return (a << imm) & 0xFFFFFFFF, pc + 4
+def _ex_srli(pc, a, b, imm, tgt, mem):  return a >> imm, pc + 4
+def _ex_srai(pc, a, b, imm, tgt, mem):  return (((a ^ 0x80000000) - 0x80000000) >> imm) & 0xFFFFFFFF, pc + 4
+
+def _ex_add(pc, a, b, imm, tgt, mem):   return (a + b) & 0xFFFFFFFF, pc + 4
+def _ex_sub(pc, a, b, imm, tgt, mem):   return (a - b) & 0xFFFFFFFF, pc + 4
+def _ex_sll(pc, a, b, imm, tgt, mem):   return (a << (b & 0x1F)) & 0xFFFFFFFF, pc + 4
+def _ex_slt(pc, a, b, imm, tgt, mem):   return (1 if (a ^ 0x80000000) < (b ^ 0x80000000) else 0), pc + 4
+def _ex_sltu(pc, a, b, imm, tgt, mem):  return (1 if a < b else 0), pc + 4
+def _ex_xor(pc, a, b, imm, tgt, mem):   return a ^ b, pc + 4
+def _ex_srl(pc, a, b, imm, tgt, mem):   return a >> (b & 0x1F), pc + 4
+def _ex_sra(pc, a, b, imm, tgt, mem):   return (((a ^ 0x80000000) - 0x80000000) >> (b & 0x1F)) & 0xFFFFFFFF, pc + 4
+def _ex_or(pc, a, b, imm, tgt, mem):    return a | b, pc + 4
+def _ex_and(pc, a, b, imm, tgt, mem):   return a & b, pc + 4
+
+def _unresolved(pc):
+    raise RuntimeError(f"Unresolved branch at PC={pc:08x}")
+
+def _ex_beq(pc, a, b, imm, tgt, mem):
+    if tgt is None: _unresolved(pc)
+    return 0, (tgt if a == b else pc + 4)
+def _ex_bne(pc, a, b, imm, tgt, mem):
+    if tgt is None: _unresolved(pc)
+    return 0, (tgt if a != b else pc + 4)
+def _ex_blt(pc, a, b, imm, tgt, mem):
+    if tgt is None: _unresolved(pc)
+    return 0, (tgt if (a ^ 0x80000000) < (b ^ 0x80000000) else pc + 4)
+def _ex_bge(pc, a, b, imm, tgt, mem):
+    if tgt is None: _unresolved(pc)
+    return 0, (tgt if (a ^ 0x80000000) >= (b ^ 0x80000000) else pc + 4)
+def _ex_bltu(pc, a, b, imm, tgt, mem):
+    if tgt is None: _unresolved(pc)
+    return 0, (tgt if a < b else pc + 4)
+def _ex_bgeu(pc, a, b, imm, tgt, mem):
+    if tgt is None: _unresolved(pc)
+    return 0, (tgt if a >= b else pc + 4)
+
+def _ex_jal(pc, a, b, imm, tgt, mem):
+    if tgt is None:
+        raise RuntimeError(f"Unresolved JAL at PC={pc:08x}")
+    return (pc + 4) & 0xFFFFFFFF, tgt
+
+def _ex_jalr(pc, a, b, imm, tgt, mem):
+    return (pc + 4) & 0xFFFFFFFF, (a + imm) & 0xFFFFFFFE
+
+# Loads and stores are built per (size, signed) from one body each. Naturally
+# aligned accesses (bytes always are) never straddle a page, so they index the
+# page's size view directly; anything else goes through mem_read/mem_write.
+_LD_SEXT = {1: SEXT8, 2: SEXT16}
+
+def _load(size, signed):
+    ext = _LD_SEXT[size] if signed else None
+    if size > 1 and not _MEM_ALIGNED_VIEWS:
+        # No native little-endian views: every access goes through mem_read
+        def ex(pc, a, b, imm, tgt, mem):
+            v = mem_read(mem, (a + imm) & 0xFFFFFFFF, size)
+            return (ext[v] & 0xFFFFFFFF if ext else v), pc + 4
+        return ex
+    amask = size - 1
+    shift = size >> 1    # byte offset -> index into the size view
+    def ex(pc, a, b, imm, tgt, mem):
+        addr = (a + imm) & 0xFFFFFFFF
+        if not addr & amask:
+            page = mem.get(addr >> MEM_PAGE_BITS)
+            v = page[size][(addr & MEM_PAGE_MASK) >> shift] if page else 0
+        else:
+            v = mem_read(mem, addr, size)
+        return (ext[v] & 0xFFFFFFFF if ext else v), pc + 4
+    return ex
+
+def _store(size):
+    if size > 1 and not _MEM_ALIGNED_VIEWS:
+        def ex(pc, a, b, imm, tgt, mem):
+            mem_write(mem, (a + imm) & 0xFFFFFFFF, size, b)
+            return 0, pc + 4
+        return ex
+    amask = size - 1
+    shift = size >> 1
+    vmask = _MEM_VMASK[size]
+    def ex(pc, a, b, imm, tgt, mem):
+        addr = (a + imm) & 0xFFFFFFFF
+        if not addr & amask:
+            page = mem.get(addr >> MEM_PAGE_BITS)
+            if page is None:
+                page = mem[addr >> MEM_PAGE_BITS] = _mem_new_page()
+            page[size][(addr & MEM_PAGE_MASK) >> shift] = b & vmask
+        else:
+            mem_write(mem, addr, size, b)
+        return 0, pc + 4
+    return ex
+
+def fold_imm(op: str, imm: int) -> int:
+    """Reduce a Meta immediate to the value the op's handler consumes"""
+    if op in ("SLLI", "SRLI", "SRAI"):
+        return imm & 0x1F
+    if op in ("LUI", "AUIPC"):
+        return (imm & 0xFFFFF) << 12
+    return SEXT12[imm & 0xFFF]   # I/S-type and JALR; ignored by the rest
+
+EXEC_TABLE = {
+    "NOP": _ex_nop, "LUI": _ex_lui, "AUIPC": _ex_auipc,
+    "ADDI": _ex_addi, "SLTI": _ex_slti, "SLTIU": _ex_sltiu,
+    "XORI": _ex_xori, "ORI": _ex_ori, "ANDI": _ex_andi,
+    "SLLI": _ex_slli, "SRLI": _ex_srli, "SRAI": _ex_srai,
+    "ADD": _ex_add, "SUB": _ex_sub, "SLL": _ex_sll, "SLT": _ex_slt,
+    "SLTU": _ex_sltu, "XOR": _ex_xor, "SRL": _ex_srl, "SRA": _ex_sra,
+    "OR": _ex_or, "AND": _ex_and,
+    "BEQ": _ex_beq, "BNE": _ex_bne, "BLT": _ex_blt,
+    "BGE": _ex_bge, "BLTU": _ex_bltu, "BGEU": _ex_bgeu,
+    "JAL": _ex_jal, "JALR": _ex_jalr,
+    "LB": _load(1, True), "LBU": _load(1, False), "LH": _load(2, True),
+    "LHU": _load(2, False), "LW": _load(4, False),
+    "SB": _store(1), "SH": _store(2), "SW": _store(4),
+}
+
 # -------------------------
 # Golden Reference Simulator (Generate Commit Trace)
 # -------------------------
+def _trap(msg: str):
+    """Handler for a word that must not execute (DATA or an unknown op)"""
+    def ex(pc, a, b, imm, tgt, mem):
+        raise RuntimeError(msg)
+    return ex
+
+def decode_program(words: List[int], meta: List[Meta]) -> list:
+    """
+    Pre-decode a program for _run_program: one (handler, rd, rs1, rs2, imm,
+    target_pc) tuple per word, with imm already folded by fold_imm. Words that
+    must not execute get a trap handler, so every step dispatches the same way.
+    """
+    prog = []
+    for idx, m in enumerate(meta):
+        fn = EXEC_TABLE.get(m.op)
+        if fn is None:
+            pc = idx * 4
+            if m.op == "DATA":
+                fn = _trap(f"Executed DATA at PC={pc:08x} word={words[idx]:08x}")
+            else:
+                fn = _trap(f"Unknown op {m.op} at PC={pc:08x}")
+        prog.append((fn, m.rd, m.rs1, m.rs2, fold_imm(m.op, m.imm), m.target_pc))
+    return prog
+
+def _run_program(prog: list, regs: List[int], mem: dict[int,tuple],
+                 max_steps: int, record_commits: bool = True,
+                 start_pc: int = 0) -> Tuple[int, int, List[int], List[int]]:
+    """
+    Execution kernel: runs the pre-decoded program from start_pc, updating
+    regs and mem in place. Returns the number of steps run, the PC it stopped
+    at and, if record_commits, the word index and committed rd value of each
+    step (empty lists otherwise); building CommitEntry objects is left to the
+    caller.
+    """
+    n_words = len(prog)
+    commit_idx: List[int] = []
+    commit_data: List[int] = []
+    # Bound methods as locals: the loop below calls them every step
+    log_idx = commit_idx.append
+    log_data = commit_data.append
+
+    # Word i lives at PC 4*i; stop on a misaligned or out-of-image PC.
+    pc = start_pc
+    cycle = 0
+    while cycle < max_steps:
+        idx = pc >> 2
+        if pc & 3 or not 0 <= idx < n_words:
+            break
+        fn, rd, rs1, rs2, imm, tgt = prog[idx]
+
+        # Execute instruction (regs[0] is kept at zero)
+        rd_data, next_pc = fn(pc, regs[rs1], regs[rs2], imm, tgt, mem)
+
+        # Commit architectural write; handlers return u32 already and x0 is
+        # never written, so regs[0] stays zero without a reset
+        if rd != 0:
+            regs[rd] = rd_data
+        elif record_commits:
+            rd_data = 0
+
+        if record_commits:
+            log_idx(idx)
+            log_data(rd_data)
+
+        pc = next_pc
+        cycle += 1
+
+    return cycle, pc, commit_idx, commit_data
+
+# -------------------------
+# Block compiler
+# -------------------------
+# Straight-line Python for the ops that have one; a = rs1 value, b = rs2
+# value, imm is folded as for the handlers and pc is the instruction's PC.
+# Everything else (loads, stores, NOP, traps, unresolved targets) calls its
+# handler from the block instead.
+_BLOCK_EXPR = {
+    "LUI":   "{imm}",
+    "AUIPC": "{auipc}",
+    "ADDI":  "({a} + {imm}) & 0xFFFFFFFF",
+    "SLTI":  "1 if ({a} ^ 0x80000000) - 0x80000000 < {imm} else 0",
+    "SLTIU": "1 if {a} < {uimm} else 0",
+    "XORI":  "({a} ^ {imm}) & 0xFFFFFFFF",
+    "ORI":   "({a} | {imm}) & 0xFFFFFFFF",
+    "ANDI":  "{a} & {imm}",
+    "SLLI":  "({a} << {imm}) & 0xFFFFFFFF",
+    "SRLI":  "{a} >> {imm}",
+    "SRAI":  "((({a} ^ 0x80000000) - 0x80000000) >> {imm}) & 0xFFFFFFFF",
+    "ADD":   "({a} + {b}) & 0xFFFFFFFF",
+    "SUB":   "({a} - {b}) & 0xFFFFFFFF",
+    "SLL":   "({a} << ({b} & 0x1F)) & 0xFFFFFFFF",
+    "SLT":   "1 if ({a} ^ 0x80000000) < ({b} ^ 0x80000000) else 0",
+    "SLTU":  "1 if {a} < {b} else 0",
+    "XOR":   "{a} ^ {b}",
+    "SRL":   "{a} >> ({b} & 0x1F)",
+    "SRA":   "((({a} ^ 0x80000000) - 0x80000000) >> ({b} & 0x1F)) & 0xFFFFFFFF",
+    "OR":    "{a} | {b}",
+    "AND":   "{a} & {b}",
+}
+_BLOCK_COND = {
+    "BEQ":  "{a} == {b}",
+    "BNE":  "{a} != {b}",
+    "BLT":  "({a} ^ 0x80000000) < ({b} ^ 0x80000000)",
+    "BGE":  "({a} ^ 0x80000000) >= ({b} ^ 0x80000000)",
+    "BLTU": "{a} < {b}",
+    "BGEU": "{a} >= {b}",
+}
+_BLOCK_END = frozenset(_BLOCK_COND) | {"JAL", "JALR"}
+
+def _compile_block(prog: list, meta: List[Meta], start: int):
+    """
+    Compile the straight-line run from word index start up to and including
+    the next branch/jump (or the end of the image) into one Python function
+    blk(r, mem) -> (next_pc, rd values). Returns (blk, n_insts).
+    """
+    lines = ["def blk(r, mem):"]
+    ns: Dict[str, object] = {}
+    data = []
+    next_pc = None
+    i = start
+    while i < len(prog):
+        fn, rd, rs1, rs2, imm, tgt = prog[i]
+        op = meta[i].op
+        pc = i * 4
+        a, b = f"r[{rs1}]", f"r[{rs2}]"
+        t = f"t{i - start}"
+        if op in _BLOCK_EXPR:
+            lines.append(f"    {t} = " + _BLOCK_EXPR[op].format(
+                a=a, b=b, imm=imm, uimm=imm & 0xFFFFFFFF,
+                auipc=(pc + imm) & 0xFFFFFFFF))
+        elif op in _BLOCK_COND and tgt is not None:
+            cond = _BLOCK_COND[op].format(a=a, b=b)
+            next_pc = f"{tgt} if {cond} else {pc + 4}"
+            rd = 0
+        elif op == "JAL" and tgt is not None:
+            lines.append(f"    {t} = {(pc + 4) & 0xFFFFFFFF}")
+            next_pc = str(tgt)
+        elif op == "JALR":
+            # Target first: rd may be rs1
+            lines.append(f"    n = ({a} + {imm}) & 0xFFFFFFFE")
+            lines.append(f"    {t} = {(pc + 4) & 0xFFFFFFFF}")
+            next_pc = "n"
+        else:
+            ns[f"h{i}"] = fn
+            lines.append(f"    {t}, n = h{i}({pc}, {a}, {b}, {imm}, {tgt}, mem)")
+            if op in _BLOCK_END:
+                next_pc = "n"
+        if rd != 0:
+            lines.append(f"    r[{rd}] = {t}")
+            data.append(t)
+        else:
+            data.append("0")
+        i += 1
+        if op in _BLOCK_END:
+            break
+    if next_pc is None:
+        next_pc = str(i * 4)
+    lines.append(f"    return {next_pc}, ({', '.join(data)},)")
+    exec(compile("\n".join(lines), f"<rv32i block @{start * 4:08x}>", "exec"), ns)
+    return ns["blk"], i - start
+
+def compile_program(prog: list, meta: List[Meta]):
+    """
+    Build a drop-in replacement for _run_program(prog, ...) that runs whole
+    basic blocks as compiled Python: decode, dispatch and immediate handling
+    fold away, leaving one call per block. Blocks are compiled on first entry
+    and cached by PC, so a JALR into the middle of a block just starts a new
+    one. A block that would overrun max_steps is finished by _run_program.
+    """
+    n_words = len(prog)
+    blocks: Dict[int, tuple] = {}
+
+    def run(regs: List[int], mem: dict[int,tuple], max_steps: int,
+            record_commits: bool = True, start_pc: int = 0
+            ) -> Tuple[int, int, List[int], List[int]]:
+        commit_idx: List[int] = []
+        commit_data: List[int] = []
+        pc = start_pc
+        steps = 0
+        while steps < max_steps:
+            blk = blocks.get(pc)
+            if blk is None:
+                if pc & 3 or not 0 <= pc >> 2 < n_words:
+                    break
+                blk = blocks[pc] = _compile_block(prog, meta, pc >> 2)
+            fn, n = blk
+            if steps + n > max_steps:
+                tail, pc, tail_idx, tail_data = _run_program(
+                    prog, regs, mem, max_steps - steps, record_commits, pc)
+                steps += tail
+                commit_idx += tail_idx
+                commit_data += tail_data
+                break
+            start = pc >> 2
+            pc, data = fn(regs, mem)
+            steps += n
+            if record_commits:
+                commit_idx += range(start, start + n)
+                commit_data += data
+        return steps, pc, commit_idx, commit_data
+
+    return run
+
+# Runs shorter than this are interpreted: compiling blocks costs more than it
+# saves unless the program loops (the generated tests finish in a few hundred
+# steps; only runaway or long-looping programs reach it).
+COMPILE_AFTER_STEPS = 4096
+
+def _execute(prog: list, meta: List[Meta], regs: List[int],
+             mem: dict[int,tuple], max_steps: int,
+             record_commits: bool = True) -> Tuple[int, List[int], List[int]]:
+    """
+    Run a pre-decoded program from PC 0: interpret the first
+    COMPILE_AFTER_STEPS steps, then continue with compile_program. Returns
+    (steps, commit_idx, commit_data) as _run_program does.
+    """
+    steps, pc, commit_idx, commit_data = _run_program(
+        prog, regs, mem, min(max_steps, COMPILE_AFTER_STEPS), record_commits)
+    if steps == COMPILE_AFTER_STEPS < max_steps:
+        more, pc, more_idx, more_data = compile_program(prog, meta)(
+            regs, mem, max_steps - steps, record_commits, pc)
+        steps += more
+        commit_idx += more_idx
+        commit_data += more_data
+    return steps, commit_idx, commit_data
+
 def simulate_commit_trace(words: List[int], meta: List[Meta], asm: List[str], 
-                          max_steps: int = 200000) -> Tuple[List[CommitEntry], List[int]]:
+                          max_steps: int = 200000) -> Tuple[CommitTrace, List[int]]:
     """
     Simulate program execution and generate golden commit trace.
     This is what an OOO processor MUST match at commit (not execution order).
     
     Returns:
-        commit_trace: List of commit entries in program order
+        commit_trace: Commit entries in program order (a CommitTrace)
         final_regfile: Final architectural register state
     """
     regs = [0] * 32
-    pc_to_idx = {i * 4: i for i in range(len(words))}
-    mem: dict[int,int] = {}  # byte-addressable
+    mem: dict[int,tuple] = {}  # byte-addressable, see mem_read/mem_write
 
-    
-    pc = 0
-    cycle = 0
-    commit_trace: List[CommitEntry] = []
-    
-    def r(i: int) -> int:
-        return 0 if i == 0 else regs[i]
-    
-    while cycle < max_steps and pc in pc_to_idx:
-        idx = pc_to_idx[pc]
-        w = words[idx]
-        m = meta[idx]
-        op = m.op
-        
-        rd, rs1, rs2, imm = m.rd, m.rs1, m.rs2, m.imm
-        next_pc = pc + 4
-        rd_data = 0
-        
-        # Execute instruction
-        if op == "NOP":
-            pass
-            
-        elif op == "LUI":
-            rd_data = u32((imm & 0xFFFFF) << 12)
-            
-        elif op == "AUIPC":
-            rd_data = u32(pc + ((imm & 0xFFFFF) << 12))
-            
-        elif op == "ADDI":
-            rd_data = u32(r(rs1) + sext(imm, 12))
-            
-        elif op == "SLTI":
-            rd_data = 1 if s32(r(rs1)) < sext(imm, 12) else 0
-            
-        elif op == "SLTIU":
-            rd_data = 1 if u32(r(rs1)) < u32(sext(imm, 12)) else 0
-            
-        elif op == "XORI":
-            rd_data = u32(r(rs1) ^ sext(imm, 12))
-            
-        elif op == "ORI":
-            rd_data = u32(r(rs1) | sext(imm, 12))
-            
-        elif op == "ANDI":
-            rd_data = u32(r(rs1) & sext(imm, 12))
-            
-        elif op == "SLLI":
-            rd_data = u32(r(rs1) << (imm & 0x1F))
-            
-        elif op == "SRLI":
-            rd_data = u32(u32(r(rs1)) >> (imm & 0x1F))
-            
-        elif op == "SRAI":
-            rd_data = u32(s32(r(rs1)) >> (imm & 0x1F))
-            
-        elif op == "ADD":
-            rd_data = u32(r(rs1) + r(rs2))
-            
-        elif op == "SUB":
-            rd_data = u32(r(rs1) - r(rs2))
-            
-        elif op == "SLL":
-            rd_data = u32(r(rs1) << (r(rs2) & 0x1F))
-            
-        elif op == "SLT":
-            rd_data = 1 if s32(r(rs1)) < s32(r(rs2)) else 0
-            
-        elif op == "SLTU":
-            rd_data = 1 if u32(r(rs1)) < u32(r(rs2)) else 0
-            
-        elif op == "XOR":
-            rd_data = u32(r(rs1) ^ r(rs2))
-            
-        elif op == "SRL":
-            rd_data = u32(u32(r(rs1)) >> (r(rs2) & 0x1F))
-            
-        elif op == "SRA":
-            rd_data = u32(s32(r(rs1)) >> (r(rs2) & 0x1F))
-            
-        elif op == "OR":
-            rd_data = u32(r(rs1) | r(rs2))
-            
-        elif op == "AND":
-            rd_data = u32(r(rs1) & r(rs2))
-            
-        elif op in ("BEQ", "BNE", "BLT", "BGE", "BLTU", "BGEU"):
-            if m.target_pc is None:
-                raise RuntimeError(f"Unresolved branch at PC={pc:08x}")
-            
-            taken = False
-            if op == "BEQ":
-                taken = (u32(r(rs1)) == u32(r(rs2)))
-            elif op == "BNE":
-                taken = (u32(r(rs1)) != u32(r(rs2)))
-            elif op == "BLT":
-                taken = (s32(r(rs1)) < s32(r(rs2)))
-            elif op == "BGE":
-                taken = (s32(r(rs1)) >= s32(r(rs2)))
-            elif op == "BLTU":
-                taken = (u32(r(rs1)) < u32(r(rs2)))
-            else:  # BGEU
-                taken = (u32(r(rs1)) >= u32(r(rs2)))
-            
-            next_pc = m.target_pc if taken else pc + 4
-            rd_data = 0  # Branches don't write registers
-            
-        elif op == "JAL":
-            if m.target_pc is None:
-                raise RuntimeError(f"Unresolved JAL at PC={pc:08x}")
-            rd_data = u32(pc + 4)
-            next_pc = m.target_pc
-            
-        elif op == "JALR":
-            rd_data = u32(pc + 4)
-            next_pc = u32(r(rs1) + sext(imm, 12)) & 0xFFFFFFFE
-
-        elif op == "LB":
-            addr = u32(r(rs1) + sext(imm, 12))
-            b = mem_read(mem, addr, 1)
-            rd_data = u32(sext(b, 8))
-
-        elif op == "LBU":
-            addr = u32(r(rs1) + sext(imm, 12))
-            b = mem_read(mem, addr, 1)
-            rd_data = u32(b)
-
-        elif op == "LH":
-            addr = u32(r(rs1) + sext(imm, 12))
-            h = mem_read(mem, addr, 2)
-            rd_data = u32(sext(h, 16))
-
-        elif op == "LHU":
-            addr = u32(r(rs1) + sext(imm, 12))
-            h = mem_read(mem, addr, 2)
-            rd_data = u32(h)
-
-        elif op == "LW":
-            addr = u32(r(rs1) + sext(imm, 12))
-            w32 = mem_read(mem, addr, 4)
-            rd_data = u32(w32)
-
-        elif op == "SB":
-            addr = u32(r(rs1) + sext(imm, 12))
-            mem_write(mem, addr, 1, r(rs2))
-            rd_data = 0
-
-        elif op == "SH":
-            addr = u32(r(rs1) + sext(imm, 12))
-            mem_write(mem, addr, 2, r(rs2))
-            rd_data = 0
+    # Decode once up front; loop bodies reuse the same tuples on every visit
+    prog = decode_program(words, meta)
 
-        elif op == "SW":
-            addr = u32(r(rs1) + sext(imm, 12))
-            mem_write(mem, addr, 4, r(rs2))
-            rd_data = 0
-        elif op == "DATA":
-            raise RuntimeError(f"Executed DATA at PC={pc:08x} word={w:08x}")
+    steps, commit_idx, commit_data = _execute(prog, meta, regs, mem, max_steps)
 
+    if steps >= max_steps:
+        print(f"WARNING: Simulation stopped at max_steps={max_steps}")
 
-        else:
-            raise RuntimeError(f"Unknown op {op} at PC={pc:08x}")
-        
-        # Commit architectural write
-        if rd != 0:
-            regs[rd] = u32(rd_data)
-        regs[0] = 0  # x0 always zero
-        
-        # Record commit entry
-        commit_trace.append(CommitEntry(
-            cycle=cycle,
-            pc=pc,
-            inst=w,
-            rd=rd,
-            rd_data=regs[rd] if rd != 0 else 0,
-            asm=asm[idx]
-        ))
-        
-        pc = next_pc
-        cycle += 1
+    commit_trace = CommitTrace(commit_idx, commit_data, words, [t[1] for t in prog], asm)
+    return commit_trace, regs
 
-    if cycle >= max_steps:
+def run_until_halt(words: List[int], meta: List[Meta],
+                   max_steps: int = 200000) -> List[int]:
+    """
+    Run a program like simulate_commit_trace but without recording commits,
+    for callers that only need the final architectural register state
+    (e.g. checking a self-check program's x31/x30).
+    """
+    regs = [0] * 32
+    mem: dict[int,tuple] = {}
+    steps, _, _ = _execute(decode_program(words, meta), meta, regs, mem,
+                           max_steps, record_commits=False)
+    if steps >= max_steps:
         print(f"WARNING: Simulation stopped at max_steps={max_steps}")
+    return regs
 
-    return commit_trace, regs
+# One trace line per (cycle, pc, inst, rd, rd_data, asm) row
+_TRACE_LINE = "%6d  %08x  %08x  x%02d  %08x  %s\n"
 
-def write_commit_trace(path: str, commit_trace: List[CommitEntry]):
+def write_commit_trace(path: str, commit_trace: Sequence[CommitEntry]):
     """
     Write golden commit trace to a text file.
     This is what your OoO core must match at commit.
     """
+    if isinstance(commit_trace, CommitTrace):
+        rows = commit_trace.rows()
+    else:
+        rows = ((e.cycle, e.pc, e.inst, e.rd, e.rd_data, e.asm) for e in commit_trace)
+    # Build the whole file in memory and hand it to a single write(); each
+    # row tuple feeds the %-template directly, with no per-row unpacking
+    body = "".join(map(_TRACE_LINE.__mod__, rows))
     with open(path, "w") as f:
-        f.write("# Golden Commit Trace\n")
-        f.write("# cycle  pc        inst       rd  data       asm\n")
-        f.write("# ------------------------------------------------------------\n")
-        for e in commit_trace:
-            f.write(
-                f"{e.cycle:6d}  "
-                f"{e.pc:08x}  "
-                f"{e.inst:08x}  "
-                f"x{e.rd:02d}  "
-                f"{e.rd_data:08x}  "
-                f"{e.asm}\n"
-            )
+        f.write("# Golden Commit Trace\n"
+                "# cycle  pc        inst       rd  data       asm\n"
+                "# ------------------------------------------------------------\n"
+                + body)
 
 
 
@@ -1272,16 +1697,12 @@ def prog_mem_lw_sw_basic(a: Asm):
     # Base pointer (choose any RAM base your TB maps; 0x100 is common in small sims)
     a.li(20, 0x00000100, "mem base")
 
-    a.li(1, 0x11223344, "pattern")
-    a.sw(1, 20, 0)               # [base+0] = 0x11223344
-    a.lw(2, 20, 0)               # x2 = [base+0]
-    a.check_reg(2, 0x11223344, 0)
+    a.store_imm(0x11223344, 20, 0, comment="pattern")   # [base+0] = 0x11223344
+    a.load_check(2, 20, 0, 0x11223344, 0)               # x2 = [base+0]
 
     # Overwrite and re-read (store->load)
-    a.li(1, 0xA5A5A5A5, "pattern2")
-    a.sw(1, 20, 0)
-    a.lw(2, 20, 0)
-    a.check_reg(2, 0xA5A5A5A5, 1)
+    a.store_imm(0xA5A5A5A5, 20, 0, comment="pattern2")
+    a.load_check(2, 20, 0, 0xA5A5A5A5, 1)
 
     a.finalize_test(expected_x31=0)
 
@@ -1345,6 +1766,7 @@ def prog_mem_endian_overlay(a: Asm):
 # ADVANCED RV32I TESTS - Add these to your TESTS dict
 # ==========================================
 
+@cached_program
 def prog_raw_data_hazards(a: Asm):
     """Test RAW (Read-After-Write) data hazards - critical for OOO"""
     a.init_test()
@@ -1374,6 +1796,7 @@ def prog_raw_data_hazards(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+@cached_program
 def prog_war_waw_hazards(a: Asm):
     """Test WAR (Write-After-Read) and WAW (Write-After-Write) hazards"""
     a.init_test()
@@ -1410,10 +1833,8 @@ def prog_load_use_hazard(a: Asm):
     a.li(20, 0x00000100, "mem base")
     
     # Store some values
-    a.li(1, 0x12345678)
-    a.sw(1, 20, 0)
-    a.li(2, 0xABCDEF00)
-    a.sw(2, 20, 4)
+    a.store_imm(0x12345678, 20, 0, tmp=1)
+    a.store_imm(0xABCDEF00, 20, 4, tmp=2)
     
     # Load-use hazard: load followed immediately by dependent instruction
     a.lw(3, 20, 0)     # Load
@@ -1448,10 +1869,8 @@ def prog_store_load_forwarding(a: Asm):
     a.li(20, 0x00000100, "mem base")
     
     # Basic store-load forwarding (same address)
-    a.li(1, 0xCAFEBABE)
-    a.sw(1, 20, 0)
-    a.lw(2, 20, 0)     # Should get forwarded value
-    a.check_reg(2, 0xCAFEBABE, 0)
+    a.store_imm(0xCAFEBABE, 20, 0)
+    a.load_check(2, 20, 0, 0xCAFEBABE, 0)   # Should get forwarded value
     
     # Partial forwarding: store byte, load word
     a.li(3, 0xFF)
@@ -1460,10 +1879,8 @@ def prog_store_load_forwarding(a: Asm):
     a.check_reg(4, 0xCAFEBAFF, 1)
     
     # Store-load with offset
-    a.li(5, 0x11223344)
-    a.sw(5, 20, 12)
-    a.lw(6, 20, 12)
-    a.check_reg(6, 0x11223344, 2)
+    a.store_imm(0x11223344, 20, 12, tmp=5)
+    a.load_check(6, 20, 12, 0x11223344, 2)
     
     # Multiple stores to different addresses
     a.li(7, 0xAAAAAAAA)
@@ -1492,30 +1909,22 @@ def prog_memory_aliasing(a: Asm):
     a.li(20, 0x00000100, "mem base")
     
     # Positive and negative offsets
-    a.li(1, 0x12345678)
-    a.sw(1, 20, 100)
-    a.lw(2, 20, 100)
-    a.check_reg(2, 0x12345678, 0)
+    a.store_imm(0x12345678, 20, 100)
+    a.load_check(2, 20, 100, 0x12345678, 0)
     
     # Same address via different base+offset
     a.addi(21, 20, 50)   # x21 = base + 50
-    a.li(3, 0xABCDEF01)
-    a.sw(3, 21, 50)      # Store to base+100 via (base+50)+50
-    a.lw(4, 20, 100)     # Load from base+100 via base+100
-    a.check_reg(4, 0xABCDEF01, 1)
+    a.store_imm(0xABCDEF01, 21, 50, tmp=3)   # Store to base+100 via (base+50)+50
+    a.load_check(4, 20, 100, 0xABCDEF01, 1)  # Load from base+100 via base+100
     
     # Negative offset
     a.addi(22, 20, 200)  # x22 = base + 200
-    a.li(5, 0xFEEDFACE)
-    a.sw(5, 22, -100)    # Store to base+100 via (base+200)-100
-    a.lw(6, 20, 100)
-    a.check_reg(6, 0xFEEDFACE, 2)
+    a.store_imm(0xFEEDFACE, 22, -100, tmp=5) # Store to base+100 via (base+200)-100
+    a.load_check(6, 20, 100, 0xFEEDFACE, 2)
     
     # Sign extension of offset
-    a.li(7, 0x99887766)
-    a.sw(7, 20, -4)      # Negative offset with sign extension
-    a.lw(8, 20, -4)
-    a.check_reg(8, 0x99887766, 3)
+    a.store_imm(0x99887766, 20, -4, tmp=7)   # Negative offset with sign extension
+    a.load_check(8, 20, -4, 0x99887766, 3)
     
     a.finalize_test(expected_x31=0)
 
@@ -1606,13 +2015,18 @@ def prog_deeply_nested_calls(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+def _reg_pressure_init(s: Asm):
+    for i in range(1, 28):
+        s.addi(i, 0, i * 10)
+
+_REG_PRESSURE_INIT = asm_block(_reg_pressure_init)
+
 def prog_register_pressure(a: Asm):
     """Test high register pressure (use all registers)"""
     a.init_test()
     
     # Initialize all registers (except x0, x28-x31 which are used by check_reg)
-    for i in range(1, 28):
-        a.addi(i, 0, i * 10)
+    a.emit_block(_REG_PRESSURE_INIT)
     
     # Check a few
     a.check_reg(1, 10, 0)
@@ -1636,6 +2050,7 @@ def prog_register_pressure(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+@cached_program
 def prog_arithmetic_edge_cases(a: Asm):
     """Test arithmetic edge cases and overflow"""
     a.init_test()
@@ -1681,6 +2096,7 @@ def prog_arithmetic_edge_cases(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+@cached_program
 def prog_shift_edge_cases(a: Asm):
     """Comprehensive shift edge case testing"""
     a.init_test()
@@ -1731,6 +2147,7 @@ def prog_shift_edge_cases(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+@cached_program
 def prog_bitwise_patterns(a: Asm):
     """Test bitwise operations with various patterns"""
     a.init_test()
@@ -1775,6 +2192,7 @@ def prog_bitwise_patterns(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+@cached_program
 def prog_immediate_edge_cases(a: Asm):
     """Test immediate value edge cases"""
     a.init_test()
@@ -1825,12 +2243,9 @@ def prog_memory_boundary(a: Asm):
     a.li(20, 0x00000100, "mem base")
     
     # Word-aligned accesses
-    a.li(1, 0x11111111)
-    a.sw(1, 20, 0)
-    a.li(2, 0x22222222)
-    a.sw(2, 20, 4)
-    a.li(3, 0x33333333)
-    a.sw(3, 20, 8)
+    a.store_imm(0x11111111, 20, 0, tmp=1)
+    a.store_imm(0x22222222, 20, 4, tmp=2)
+    a.store_imm(0x33333333, 20, 8, tmp=3)
     
     # Verify alignment
     a.lw(4, 20, 0)
@@ -1859,36 +2274,38 @@ def prog_memory_boundary(a: Asm):
     a.check_reg(11, 0xFFFFFFFF, 5)
     
     # Large offset
-    a.li(12, 0xBEEFCAFE)
-    a.sw(12, 20, 2044)  # Near max 12-bit offset
-    a.lw(13, 20, 2044)
-    a.check_reg(13, 0xBEEFCAFE, 6)
+    a.store_imm(0xBEEFCAFE, 20, 2044, tmp=12)  # Near max 12-bit offset
+    a.load_check(13, 20, 2044, 0xBEEFCAFE, 6)
     
     a.finalize_test(expected_x31=0)
 
+def _dep_chain(s: Asm):
+    s.addi(1, 0, 1)
+    for i in range(2, 22):
+        s.addi(i, i-1, 1)
+
+_DEP_CHAIN = asm_block(_dep_chain)
+
+def _fib_body(s: Asm):
+    s.addi(1, 0, 1)
+    s.addi(2, 0, 1)
+    for i in range(3, 11):
+        s.add(i, i-2, i-1)   # x3..x10 = 2, 3, 5, 8, 13, 21, 34, 55
+
+_FIB_BODY = asm_block(_fib_body)
+
 def prog_long_dependency_chain(a: Asm):
     """Very long dependency chain to stress OOO scheduler"""
     a.init_test()
     
     # Create a chain of 20 dependent instructions
-    a.addi(1, 0, 1)
-    for i in range(2, 22):
-        a.addi(i, i-1, 1)
+    a.emit_block(_DEP_CHAIN)
     
     # x21 should be 21
     a.check_reg(21, 21, 0)
     
     # Fibonacci-like sequence
-    a.addi(1, 0, 1)
-    a.addi(2, 0, 1)
-    a.add(3, 1, 2)   # 2
-    a.add(4, 2, 3)   # 3
-    a.add(5, 3, 4)   # 5
-    a.add(6, 4, 5)   # 8
-    a.add(7, 5, 6)   # 13
-    a.add(8, 6, 7)   # 21
-    a.add(9, 7, 8)   # 34
-    a.add(10, 8, 9)  # 55
+    a.emit_block(_FIB_BODY)
     a.check_reg(10, 55, 1)
     
     a.finalize_test(expected_x31=0)
@@ -1953,6 +2370,50 @@ def prog_auipc_pc_relative(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+def prog_jump_table(a: Asm):
+    """Switch dispatch through a jump table in data memory (lw + jalr)"""
+    a.init_test()
+    
+    # Table of case addresses at 0x700, built with PC-relative la
+    a.li(21, 0x00000700, "jump table base")
+    for i, case in enumerate(("CASE0", "CASE1", "CASE2", "CASE_DEFAULT")):
+        a.la(5, case)
+        a.sw(5, 21, 4 * i)
+    
+    a.addi(10, 0, 0)  # result
+    a.addi(1, 0, 0)   # selector
+    a.addi(9, 0, 4)   # number of cases
+    
+    # Visit every case once: target = table[selector]
+    a.label("DISPATCH")
+    a.slli(6, 1, 2)
+    a.add(6, 21, 6)
+    a.lw(6, 6, 0)
+    a.jalr(0, 6, 0)
+    
+    a.label("CASE0")
+    a.addi(10, 10, 1)
+    a.jal(0, "CASE_END")
+    
+    a.label("CASE1")
+    a.addi(10, 10, 10)
+    a.jal(0, "CASE_END")
+    
+    a.label("CASE2")
+    a.addi(10, 10, 100)
+    a.jal(0, "CASE_END")
+    
+    a.label("CASE_DEFAULT")
+    a.addi(10, 10, 1000)
+    
+    a.label("CASE_END")
+    a.addi(1, 1, 1)
+    a.blt(1, 9, "DISPATCH")
+    
+    a.check_reg(10, 1111, 0)
+    
+    a.finalize_test(expected_x31=0)
+
 def prog_control_flow_chaos(a: Asm):
     """Chaotic control flow to stress branch predictor"""
     a.init_test()
@@ -2003,38 +2464,32 @@ def prog_control_flow_chaos(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+# (rd, rs1, rs2) for the add tree that consumes x1..x10
+_ROB_ADDS = ((11, 1, 2), (12, 3, 4), (13, 5, 6), (14, 7, 8),
+             (15, 11, 12), (16, 13, 14), (17, 15, 16), (18, 17, 9), (19, 18, 10))
+
+def _rob_body(s: Asm):
+    # Create many independent operations: xi = i
+    for i in range(1, 11):
+        s.addi(i, 0, i)
+    # Now use them all
+    for rd, rs1, rs2 in _ROB_ADDS:
+        s.add(rd, rs1, rs2)
+
+_ROB_BODY = asm_block(_rob_body)
+
 def prog_stress_reorder_buffer(a: Asm):
     """Stress the reorder buffer with many in-flight instructions"""
     a.init_test()
     
-    # Create many independent operations
-    a.addi(1, 0, 1)
-    a.addi(2, 0, 2)
-    a.addi(3, 0, 3)
-    a.addi(4, 0, 4)
-    a.addi(5, 0, 5)
-    a.addi(6, 0, 6)
-    a.addi(7, 0, 7)
-    a.addi(8, 0, 8)
-    a.addi(9, 0, 9)
-    a.addi(10, 0, 10)
-    
-    # Now use them all
-    a.add(11, 1, 2)
-    a.add(12, 3, 4)
-    a.add(13, 5, 6)
-    a.add(14, 7, 8)
-    a.add(15, 11, 12)
-    a.add(16, 13, 14)
-    a.add(17, 15, 16)
-    a.add(18, 17, 9)
-    a.add(19, 18, 10)
+    a.emit_block(_ROB_BODY)
     
     # Expected: (1+2+3+4) + (5+6+7+8) + 9 + 10 = 55
     a.check_reg(19, 55, 0)
     
     a.finalize_test(expected_x31=0)
 
+@cached_program
 def prog_exception_boundary_test(a: Asm):
     """Test instruction sequences that might cause pipeline exceptions"""
     a.init_test()
@@ -2106,16 +2561,7 @@ def prog_bubble_sort(a: Asm):
     a.li(20, 0x00000400, "array base")
     
     # Initialize array: [5, 2, 8, 1, 9]
-    a.li(1, 5)
-    a.sw(1, 20, 0)
-    a.li(1, 2)
-    a.sw(1, 20, 4)
-    a.li(1, 8)
-    a.sw(1, 20, 8)
-    a.li(1, 1)
-    a.sw(1, 20, 12)
-    a.li(1, 9)
-    a.sw(1, 20, 16)
+    a.store_words(20, (5, 2, 8, 1, 9))
     
     # Bubble sort
     a.addi(10, 0, 5)   # n = 5
@@ -2159,6 +2605,54 @@ def prog_bubble_sort(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+def prog_bubble_sort_branchless(a: Asm):
+    """Bubble sort with a branchless compare-and-swap (only loop branches)"""
+    a.init_test()
+    
+    a.li(20, 0x00000400, "array base")
+    
+    # Initialize array: [5, 2, 8, 1, 9]
+    a.store_words(20, (5, 2, 8, 1, 9))
+    
+    # Bubble sort
+    a.addi(10, 0, 5)   # n = 5
+    a.addi(11, 0, 0)   # i = 0
+    
+    a.label("OUTER_LOOP")
+    a.addi(12, 0, 0)   # j = 0
+    a.sub(13, 10, 11)
+    a.addi(13, 13, -1) # limit = n - i - 1
+    
+    a.label("INNER_LOOP")
+    # Load arr[j] and arr[j+1]
+    a.slli(14, 12, 2)  # j * 4
+    a.add(15, 20, 14)  # base + j*4
+    a.lw(16, 15, 0)    # arr[j]
+    a.lw(17, 15, 4)    # arr[j+1]
+    
+    # d = (arr[j+1] < arr[j]) ? arr[j+1] - arr[j] : 0
+    # arr[j] += d, arr[j+1] -= d, then store both unconditionally
+    a.slt(18, 17, 16)  # 1 if out of order
+    a.sub(18, 0, 18)   # mask = 0 or -1
+    a.sub(19, 17, 16)
+    a._and(19, 19, 18)
+    a.add(16, 16, 19)  # min
+    a.sub(17, 17, 19)  # max
+    a.sw(16, 15, 0)
+    a.sw(17, 15, 4)
+    
+    a.addi(12, 12, 1)  # j++
+    a.blt(12, 13, "INNER_LOOP")
+    
+    a.addi(11, 11, 1)  # i++
+    a.blt(11, 10, "OUTER_LOOP")
+    
+    # Verify sorted: [1, 2, 5, 8, 9]
+    for i, v in enumerate((1, 2, 5, 8, 9)):
+        a.load_check(i + 1, 20, 4 * i, v, i)
+    
+    a.finalize_test(expected_x31=0)
+
 def prog_factorial(a: Asm):
     """Factorial calculation - recursive style simulation"""
     a.init_test()
@@ -2170,14 +2664,19 @@ def prog_factorial(a: Asm):
     
     a.label("FACT_LOOP")
     a.addi(2, 2, 1)    # i++
-    # result *= i
+    # result *= i, shift-and-add over the bits of i (no MUL in RV32I)
     a.add(4, 0, 0)     # temp = 0
-    a.add(5, 0, 2)     # counter = i
+    a.add(5, 0, 1)     # multiplicand = result
+    a.add(6, 0, 2)     # multiplier = i (>= 2)
     
     a.label("MULT_LOOP")
-    a.add(4, 4, 1)     # temp += result
-    a.addi(5, 5, -1)   # counter--
-    a.bne(5, 0, "MULT_LOOP")
+    a.andi(7, 6, 1)
+    a.beq(7, 0, "MULT_SKIP")
+    a.add(4, 4, 5)     # temp += multiplicand
+    a.label("MULT_SKIP")
+    a.slli(5, 5, 1)    # multiplicand <<= 1
+    a.srli(6, 6, 1)    # multiplier >>= 1
+    a.bne(6, 0, "MULT_LOOP")
     
     a.add(1, 4, 0)     # result = temp
     a.bne(2, 3, "FACT_LOOP")
@@ -2187,30 +2686,48 @@ def prog_factorial(a: Asm):
     a.finalize_test(expected_x31=0)
 
 def prog_gcd_euclidean(a: Asm):
-    """Greatest Common Divisor using Euclidean algorithm"""
+    """Greatest Common Divisor using binary (Stein's) GCD"""
     a.init_test()
     
-    # GCD(48, 18) = 6
+    # GCD(48, 18) = 6; RV32I has no REM, so shift out factors of two and
+    # subtract instead of computing a % b by repeated subtraction
     a.addi(1, 0, 48)   # a
     a.addi(2, 0, 18)   # b
-    
+    a.addi(4, 0, 0)    # k = common factors of two
+    
+    # while both even: a >>= 1, b >>= 1, k++
+    a.label("GCD_TWOS")
+    a._or(3, 1, 2)
+    a.andi(3, 3, 1)
+    a.bne(3, 0, "GCD_A_ODD")
+    a.srli(1, 1, 1)
+    a.srli(2, 2, 1)
+    a.addi(4, 4, 1)
+    a.jal(0, "GCD_TWOS")
+    
+    # make a odd
+    a.label("GCD_A_ODD")
+    a.andi(3, 1, 1)
+    a.bne(3, 0, "GCD_LOOP")
+    a.srli(1, 1, 1)
+    a.jal(0, "GCD_A_ODD")
+    
+    # a is odd: make b odd, order so b >= a, then b -= a (even again)
     a.label("GCD_LOOP")
-    a.beq(2, 0, "GCD_DONE")
-    
-    # temp = a % b (using repeated subtraction)
-    a.add(3, 1, 0)     # temp = a
-    a.label("MOD_LOOP")
-    a.blt(3, 2, "MOD_DONE")
-    a.sub(3, 3, 2)
-    a.jal(0, "MOD_LOOP")
-    a.label("MOD_DONE")
-    
-    # a = b, b = temp
+    a.andi(3, 2, 1)
+    a.bne(3, 0, "GCD_B_ODD")
+    a.srli(2, 2, 1)
+    a.jal(0, "GCD_LOOP")
+    a.label("GCD_B_ODD")
+    a.bgeu(2, 1, "GCD_SUB")
+    a.add(3, 1, 0)     # swap a, b
     a.add(1, 2, 0)
     a.add(2, 3, 0)
-    a.jal(0, "GCD_LOOP")
+    a.label("GCD_SUB")
+    a.sub(2, 2, 1)
+    a.bne(2, 0, "GCD_LOOP")
     
-    a.label("GCD_DONE")
+    a.sll(1, 1, 4)     # gcd = a << k
     a.check_reg(1, 6, 0)
     
     a.finalize_test(expected_x31=0)
@@ -2248,13 +2765,18 @@ def prog_recursive_factorial(a: Asm):
     a.lw(10, 20, 4)  # Pop n
     a.lw(1, 20, 0)   # Pop return addr
     
-    # Multiply n * result (using repeated addition)
+    # Multiply n * result (shift-and-add over the bits of n)
     a.add(12, 0, 0)
-    a.add(13, 0, 10)
+    a.add(13, 0, 10)   # multiplier = n
+    a.add(14, 0, 11)   # multiplicand = factorial(n-1)
     a.label("MUL_LOOP")
     a.beq(13, 0, "MUL_DONE")
-    a.add(12, 12, 11)
-    a.addi(13, 13, -1)
+    a.andi(15, 13, 1)
+    a.beq(15, 0, "MUL_SKIP")
+    a.add(12, 12, 14)
+    a.label("MUL_SKIP")
+    a.slli(14, 14, 1)
+    a.srli(13, 13, 1)
     a.jal(0, "MUL_LOOP")
     a.label("MUL_DONE")
     a.add(11, 12, 0)
@@ -2263,6 +2785,49 @@ def prog_recursive_factorial(a: Asm):
     a.label("END")
     a.finalize_test(expected_x31=0)
 
+def prog_iterative_factorial_acc(a: Asm):
+    """Accumulator-passing factorial: recursive_factorial without the stack"""
+    a.init_test()
+    
+    # factorial(5) = 120: acc = 1; while n: acc *= n; n--
+    a.addi(11, 0, 1)   # acc
+    a.addi(12, 0, 5)   # n
+    
+    a.label("LOOP")
+    a.beq(12, 0, "END")
+    
+    # acc *= n (shift-and-add over the bits of n)
+    a.add(13, 0, 0)
+    a.add(14, 0, 11)   # multiplicand = acc
+    a.add(15, 0, 12)   # multiplier = n (> 0)
+    a.label("MUL_LOOP")
+    a.andi(16, 15, 1)
+    a.beq(16, 0, "MUL_SKIP")
+    a.add(13, 13, 14)
+    a.label("MUL_SKIP")
+    a.slli(14, 14, 1)
+    a.srli(15, 15, 1)
+    a.bne(15, 0, "MUL_LOOP")
+    a.add(11, 13, 0)
+    
+    a.addi(12, 12, -1)
+    a.jal(0, "LOOP")
+    
+    a.label("END")
+    a.check_reg(11, 120, 0)
+    a.finalize_test(expected_x31=0)
+
+def _mix_alu_tail(s: Asm):
+    s.add(2, 1, 2)
+    s._xor(3, 2, 1)
+    s.slli(4, 3, 2)
+
+_MIX_ALU_TAIL = asm_block(_mix_alu_tail)
+
+# Per-iteration label names, built once
+_MIX_SKIP = tuple(f"SKIP_{i}" for i in range(10))
+_MIX_CONT = tuple(f"CONT_{i}" for i in range(10))
+
 def prog_instruction_mix(a: Asm):
     """Test diverse instruction mix for IPC measurement"""
     a.init_test()
@@ -2277,9 +2842,7 @@ def prog_instruction_mix(a: Asm):
     for i in range(10):
         # ALU cluster
         a.addi(1, 1, i)
-        a.add(2, 1, 2)
-        a._xor(3, 2, 1)
-        a.slli(4, 3, 2)
+        a.emit_block(_MIX_ALU_TAIL)
         
         # Memory cluster
         a.sw(4, 20, i*4)
@@ -2287,14 +2850,14 @@ def prog_instruction_mix(a: Asm):
         a.add(6, 5, 4)
         
         # Branch (use unique label for each iteration)
-        a.bne(6, 0, f"SKIP_{i}")
+        a.bne(6, 0, _MIX_SKIP[i])
         a.addi(7, 0, 999)
-        a.label(f"SKIP_{i}")
+        a.label(_MIX_SKIP[i])
         
         # Jump
         if i % 3 == 0:
-            a.jal(8, f"CONT_{i}")
-            a.label(f"CONT_{i}")
+            a.jal(8, _MIX_CONT[i])
+            a.label(_MIX_CONT[i])
     
     a.finalize_test(expected_x31=0)
 
@@ -2304,10 +2867,8 @@ def prog_memory_ordering(a: Asm):
     a.li(20, 0x00000600, "mem base")
     
     # Write X, write Y, read Y, read X
-    a.li(1, 0xAAAA)
-    a.sw(1, 20, 0)   # Write X
-    a.li(2, 0xBBBB)
-    a.sw(2, 20, 4)   # Write Y
+    a.store_imm(0xAAAA, 20, 0, tmp=1)   # Write X
+    a.store_imm(0xBBBB, 20, 4, tmp=2)   # Write Y
     a.lw(3, 20, 4)   # Read Y (should see 0xBBBB)
     a.lw(4, 20, 0)   # Read X (should see 0xAAAA)
     a.check_reg(3, 0xBBBB, 0)
@@ -2325,18 +2886,22 @@ def prog_memory_ordering(a: Asm):
     
     a.finalize_test(expected_x31=0)
 
+def _power_virus_body(s: Asm):
+    s.li(1, 0xAAAAAAAA)
+    s.li(2, 0x55555555)
+    s._xor(3, 1, 2)
+    s._xor(4, 2, 1)
+    s.add(5, 3, 4)
+    s.sub(6, 5, 3)
+
+_POWER_VIRUS_BODY = asm_block(_power_virus_body)
+
 def prog_power_virus(a: Asm):
     """Maximum switching activity test"""
     a.init_test()
     
     # Toggle all bits rapidly
-    for _ in range(20):
-        a.li(1, 0xAAAAAAAA)
-        a.li(2, 0x55555555)
-        a._xor(3, 1, 2)
-        a._xor(4, 2, 1)
-        a.add(5, 3, 4)
-        a.sub(6, 5, 3)
+    a.emit_block(_POWER_VIRUS_BODY, 20)
     
     a.finalize_test(expected_x31=0)
 
@@ -2394,9 +2959,7 @@ def prog_binary_search(a: Asm):
     a.li(20, 0x00000900, "array base")
     
     # Sorted array: [1, 3, 5, 7, 9, 11, 13, 15]
-    for i, val in enumerate([1, 3, 5, 7, 9, 11, 13, 15]):
-        a.li(1, val)
-        a.sw(1, 20, i * 4)
+    a.store_words(20, (1, 3, 5, 7, 9, 11, 13, 15))
     
     # Search for 9 (index 4)
     a.addi(2, 0, 9)   # target
@@ -2437,66 +3000,127 @@ def prog_binary_search(a: Asm):
     a.check_reg(10, 4, 0)
     a.finalize_test(expected_x31=0)
 
+def prog_binary_search_select(a: Asm):
+    """Binary search with branch-free left/right updates (xor-select)"""
+    a.init_test()
+    a.li(20, 0x00000900, "array base")
+    
+    # Sorted array: [1, 3, 5, 7, 9, 11, 13, 15]
+    a.store_words(20, (1, 3, 5, 7, 9, 11, 13, 15))
+    
+    # Search for 9 (index 4)
+    a.addi(2, 0, 9)   # target
+    a.addi(3, 0, 0)   # left
+    a.addi(4, 0, 7)   # right
+    
+    a.label("BSEARCH")
+    a.blt(4, 3, "NOT_FOUND")   # left > right
+    
+    # mid = (left + right) / 2
+    a.add(5, 3, 4)
+    a.srli(5, 5, 1)
+    
+    # Load arr[mid]
+    a.slli(6, 5, 2)
+    a.add(6, 20, 6)
+    a.lw(7, 6, 0)
+    
+    a.beq(7, 2, "FOUND")
+    
+    # mask = (arr[mid] < target) ? -1 : 0
+    a.slt(8, 7, 2)
+    a.sub(8, 0, 8)
+    # left = mask ? mid + 1 : left
+    a.addi(9, 5, 1)
+    a._xor(9, 9, 3)
+    a._and(9, 9, 8)
+    a._xor(3, 3, 9)
+    # right = mask ? right : mid - 1
+    a.addi(11, 5, -1)
+    a._xor(12, 4, 11)
+    a._and(12, 12, 8)
+    a._xor(4, 11, 12)
+    a.jal(0, "BSEARCH")
+    
+    a.label("FOUND")
+    a.add(10, 5, 0)  # Store found index
+    a.jal(0, "END")
+    
+    a.label("NOT_FOUND")
+    a.addi(10, 0, -1)
+    
+    a.label("END")
+    a.check_reg(10, 4, 0)
+    a.finalize_test(expected_x31=0)
+
 # ==========================================
 # ADD TO TESTS DICTIONARY
 # ==========================================
-TESTS: Dict[str, Tuple[str, Callable[[Asm], None]]] = {
-    "selfcheck_basic": ("Self-checking basic ADD/SUB with register verification", prog_selfcheck_basic),
-    "selfcheck_alu":   ("Self-checking comprehensive ALU test", prog_selfcheck_alu),
-    "selfcheck_shift": ("Self-checking shift operations with edge cases", prog_selfcheck_shifts),
-    "selfcheck_full":  ("Self-checking comprehensive test", prog_selfcheck_comprehensive),
-    "branch_basic":    ("Self-checking basic branch tests (BEQ/BNE/BLT/BGE/BLTU/BGEU)", prog_branch_basic),
-    "branch_loop":     ("Self-checking loop with backward branch", prog_branch_loop),
-    "jal_basic":       ("Self-checking JAL (jump and link)", prog_jal_basic),
-    "jalr_indirect":   ("Self-checking JALR with address masking", prog_jalr_indirect),
-    "branch_matrix":   ("Self-checking comprehensive branch condition matrix", prog_branch_matrix),
-    "nested_branch":   ("Self-checking nested branch structures", prog_nested_branches),
-    "fwd_back_branch": ("Self-checking forward and backward branches", prog_forward_backward),
-    "mem_lw_sw_basic": ("SW/LW basic + store->load", prog_mem_lw_sw_basic),
-    "mem_byte_signext": ("SB + LB/LBU sign/zero extension", prog_mem_byte_signext),
-    "mem_half_signext": ("SH + LH/LHU sign/zero extension", prog_mem_half_signext),
-    "mem_endian_overlay": ("little-endian + overlapping loads", prog_mem_endian_overlay),
+class TestEntry(NamedTuple):
+    desc: str
+    fn: Callable[[Asm], None]
+
+TESTS: Dict[str, TestEntry] = {
+    "selfcheck_basic": TestEntry("Self-checking basic ADD/SUB with register verification", prog_selfcheck_basic),
+    "selfcheck_alu":   TestEntry("Self-checking comprehensive ALU test", prog_selfcheck_alu),
+    "selfcheck_shift": TestEntry("Self-checking shift operations with edge cases", prog_selfcheck_shifts),
+    "selfcheck_full":  TestEntry("Self-checking comprehensive test", prog_selfcheck_comprehensive),
+    "branch_basic":    TestEntry("Self-checking basic branch tests (BEQ/BNE/BLT/BGE/BLTU/BGEU)", prog_branch_basic),
+    "branch_loop":     TestEntry("Self-checking loop with backward branch", prog_branch_loop),
+    "jal_basic":       TestEntry("Self-checking JAL (jump and link)", prog_jal_basic),
+    "jalr_indirect":   TestEntry("Self-checking JALR with address masking", prog_jalr_indirect),
+    "branch_matrix":   TestEntry("Self-checking comprehensive branch condition matrix", prog_branch_matrix),
+    "nested_branch":   TestEntry("Self-checking nested branch structures", prog_nested_branches),
+    "fwd_back_branch": TestEntry("Self-checking forward and backward branches", prog_forward_backward),
+    "mem_lw_sw_basic": TestEntry("SW/LW basic + store->load", prog_mem_lw_sw_basic),
+    "mem_byte_signext": TestEntry("SB + LB/LBU sign/zero extension", prog_mem_byte_signext),
+    "mem_half_signext": TestEntry("SH + LH/LHU sign/zero extension", prog_mem_half_signext),
+    "mem_endian_overlay": TestEntry("little-endian + overlapping loads", prog_mem_endian_overlay),
 
     # Data hazard tests
-    "raw_hazards": ("RAW (Read-After-Write) data hazard stress test", prog_raw_data_hazards),
-    "war_waw_hazards": ("WAR/WAW hazard patterns for OOO", prog_war_waw_hazards),
-    "load_use_hazard": ("Load-use hazards and forwarding", prog_load_use_hazard),
-    "store_load_fwd": ("Store-to-load forwarding and aliasing", prog_store_load_forwarding),
-    "mem_aliasing": ("Memory address aliasing edge cases", prog_memory_aliasing),
+    "raw_hazards": TestEntry("RAW (Read-After-Write) data hazard stress test", prog_raw_data_hazards),
+    "war_waw_hazards": TestEntry("WAR/WAW hazard patterns for OOO", prog_war_waw_hazards),
+    "load_use_hazard": TestEntry("Load-use hazards and forwarding", prog_load_use_hazard),
+    "store_load_fwd": TestEntry("Store-to-load forwarding and aliasing", prog_store_load_forwarding),
+    "mem_aliasing": TestEntry("Memory address aliasing edge cases", prog_memory_aliasing),
     
     # Control flow tests
-    "branch_pred_stress": ("Branch prediction stress patterns", prog_branch_prediction_stress),
-    "deep_calls": ("Deeply nested function calls", prog_deeply_nested_calls),
-    "control_chaos": ("Chaotic control flow patterns", prog_control_flow_chaos),
+    "branch_pred_stress": TestEntry("Branch prediction stress patterns", prog_branch_prediction_stress),
+    "deep_calls": TestEntry("Deeply nested function calls", prog_deeply_nested_calls),
+    "control_chaos": TestEntry("Chaotic control flow patterns", prog_control_flow_chaos),
+    "jump_table":    TestEntry("Switch dispatch through a data-memory jump table", prog_jump_table),
     
     # Resource pressure tests
-    "reg_pressure": ("High register pressure test", prog_register_pressure),
-    "long_dependency": ("Very long dependency chains", prog_long_dependency_chain),
-    "reorder_buffer": ("Reorder buffer stress test", prog_stress_reorder_buffer),
-    "mixed_ops_stress": ("Mixed operation types stress", prog_mixed_operations_stress),
+    "reg_pressure": TestEntry("High register pressure test", prog_register_pressure),
+    "long_dependency": TestEntry("Very long dependency chains", prog_long_dependency_chain),
+    "reorder_buffer": TestEntry("Reorder buffer stress test", prog_stress_reorder_buffer),
+    "mixed_ops_stress": TestEntry("Mixed operation types stress", prog_mixed_operations_stress),
     
     # Edge case tests
-    "arith_edge": ("Arithmetic overflow and edge cases", prog_arithmetic_edge_cases),
-    "shift_edge": ("Comprehensive shift edge cases", prog_shift_edge_cases),
-    "bitwise_patterns": ("Bitwise operation patterns", prog_bitwise_patterns),
-    "imm_edge": ("Immediate value edge cases", prog_immediate_edge_cases),
-    "mem_boundary": ("Memory boundary access tests", prog_memory_boundary),
-    "exception_boundary": ("Exception boundary conditions", prog_exception_boundary_test),
+    "arith_edge": TestEntry("Arithmetic overflow and edge cases", prog_arithmetic_edge_cases),
+    "shift_edge": TestEntry("Comprehensive shift edge cases", prog_shift_edge_cases),
+    "bitwise_patterns": TestEntry("Bitwise operation patterns", prog_bitwise_patterns),
+    "imm_edge": TestEntry("Immediate value edge cases", prog_immediate_edge_cases),
+    "mem_boundary": TestEntry("Memory boundary access tests", prog_memory_boundary),
+    "exception_boundary": TestEntry("Exception boundary conditions", prog_exception_boundary_test),
     
     # Complex algorithm tests
-    "auipc_pcrel": ("AUIPC and PC-relative addressing", prog_auipc_pc_relative),
-    "comprehensive_mem": ("Comprehensive memory operations", prog_comprehensive_memory),
-    "bubble_sort": ("Bubble sort algorithm", prog_bubble_sort),
-    "factorial": ("Factorial calculation", prog_factorial),
-    "gcd": ("GCD using Euclidean algorithm", prog_gcd_euclidean),
-
-    "recursive_factorial": ("Recursive factorial using stack", prog_recursive_factorial),
-    "instruction_mix": ("Diverse instruction mix for IPC measurement", prog_instruction_mix),
-    "memory_ordering": ("Memory operation ordering tests", prog_memory_ordering),
-    "power_virus": ("Maximum switching activity (power virus)", prog_power_virus),
-    "jalr_corner": ("JALR edge cases and RAS stress", prog_jalr_corner_cases),
-    "pipeline_flushes": ("Pipeline flush scenarios", prog_pipeline_flushes),
-    "binary_search": ("Binary search algorithm", prog_binary_search),
+    "auipc_pcrel": TestEntry("AUIPC and PC-relative addressing", prog_auipc_pc_relative),
+    "comprehensive_mem": TestEntry("Comprehensive memory operations", prog_comprehensive_memory),
+    "bubble_sort": TestEntry("Bubble sort algorithm", prog_bubble_sort),
+    "bubble_sort_bl": TestEntry("Bubble sort with branchless compare-and-swap", prog_bubble_sort_branchless),
+    "factorial": TestEntry("Factorial calculation", prog_factorial),
+    "gcd": TestEntry("GCD using Euclidean algorithm", prog_gcd_euclidean),
+
+    "recursive_factorial": TestEntry("Recursive factorial using stack", prog_recursive_factorial),
+    "factorial_acc": TestEntry("Iterative accumulator factorial (no stack)", prog_iterative_factorial_acc),
+    "instruction_mix": TestEntry("Diverse instruction mix for IPC measurement", prog_instruction_mix),
+    "memory_ordering": TestEntry("Memory operation ordering tests", prog_memory_ordering),
+    "power_virus": TestEntry("Maximum switching activity (power virus)", prog_power_virus),
+    "jalr_corner": TestEntry("JALR edge cases and RAS stress", prog_jalr_corner_cases),
+    "pipeline_flushes": TestEntry("Pipeline flush scenarios", prog_pipeline_flushes),
+    "binary_search": TestEntry("Binary search algorithm", prog_binary_search),
+    "binary_search_sel": TestEntry("Binary search with branch-free bound updates", prog_binary_search_select),
 }
 
 # -------------------------
@@ -2504,16 +3128,41 @@ TESTS: Dict[str, Tuple[str, Callable[[Asm], None]]] = {
 # -------------------------
 
 def write_hex(path: str, words: List[int]):
+    # Same big-endian pack + bytes.hex() trick as hexify.words_to_hex_lines
+    body = struct.pack(f">{len(words)}I", *(w & 0xFFFFFFFF for w in words)).hex("\n", 4)
     with open(path, "w") as f:
-        for w in words:
-            f.write(f"{w & 0xFFFFFFFF:08x}\n")
+        f.write(body + "\n" if body else "")
+
+def write_bin(path: str, words: List[int]):
+    # Raw little-endian memory image, the layout hexify.py reads back
+    with open(path, "wb") as f:
+        f.write(struct.pack(f"<{len(words)}I", *words))
 
 def write_asm(path: str, asm: List[str], words: List[int]):
     with open(path, "w") as f:
-        pc = 0
-        for a, w in zip(asm, words):
-            f.write(f"{pc:08x}: {w:08x}    {a}\n")
-            pc += 4
+        f.write("".join([f"{pc:08x}: {w:08x}    {a}\n"
+                         for pc, a, w in zip(range(0, 4 * len(asm), 4), asm, words)]))
+
+@dataclass(frozen=True, slots=True)
+class BuiltTest:
+    """Immutable snapshot of an assembled, label-resolved and padded test"""
+    words: Tuple[int, ...]
+    meta: Tuple[Meta, ...]
+    asm: Tuple[str, ...]   # empty if built with emit_asm=False
+
+@lru_cache(maxsize=None)
+def build_test(name: str, pad: int = 16, emit_asm: bool = True) -> BuiltTest:
+    """
+    Assemble TESTS[name] once per (name, pad, emit_asm); later calls return
+    the cached snapshot. Callers must not mutate the returned metas.
+    """
+    a = Asm(emit_asm=emit_asm)
+    TESTS[name].fn(a)
+    a.finalize()  # Resolve labels
+
+    for _ in range(max(0, pad)):
+        a.nop()
+    return BuiltTest(tuple(a.words), tuple(a.meta), tuple(a.asm))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -2521,29 +3170,36 @@ def main():
     ap.add_argument("--test", type=str, default="selfcheck_basic", help="Which test to generate")
     ap.add_argument("--out", type=str, default="prog", help="Output prefix")
     ap.add_argument("--pad", type=int, default=16, help="NOP padding words")
+    ap.add_argument("--hex-only", action="store_true",
+                    help="Only write the memory image (skips building the asm listing)")
+    ap.add_argument("--format", choices=("hex", "bin", "both"), default="hex",
+                    help="Memory image: readmemh .hex, raw little-endian .bin, or both")
     args = ap.parse_args()
 
     if args.list:
-        for k, (desc, _) in TESTS.items():
-            print(f"{k:18s} - {desc}")
+        for k, t in TESTS.items():
+            print(f"{k:18s} - {t.desc}")
         return
 
     if args.test not in TESTS:
         raise SystemExit(f"Unknown --test '{args.test}'. Use --list.")
 
-    a = Asm()
-    TESTS[args.test][1](a)
-    a.finalize()  # Resolve labels
-
-    for _ in range(max(0, args.pad)):
-        a.nop()
-
-    write_hex(f"{args.out}.hex", a.words)
-    write_asm(f"{args.out}.S", a.asm, a.words)
-    Commit_trace, reg = simulate_commit_trace(a.words, a.meta, a.asm)  # Just to verify no errors
-    write_commit_trace(f"{args.out}_commit_trace.txt", Commit_trace)
-
-    print(f"Wrote {args.out}.hex and {args.out}.S ({len(a.words)} words)")
+    prog = build_test(args.test, args.pad, emit_asm=not args.hex_only)
+    images = []
+    if args.format != "bin":
+        images.append(f"{args.out}.hex")
+        write_hex(images[-1], prog.words)
+    if args.format != "hex":
+        images.append(f"{args.out}.bin")
+        write_bin(images[-1], prog.words)
+    if args.hex_only:
+        run_until_halt(prog.words, prog.meta)  # Just to verify no errors
+        print(f"Wrote {' and '.join(images)} ({len(prog.words)} words)")
+    else:
+        Commit_trace, reg = simulate_commit_trace(prog.words, prog.meta, prog.asm)
+        write_asm(f"{args.out}.S", prog.asm, prog.words)
+        write_commit_trace(f"{args.out}_commit_trace.txt", Commit_trace)
+        print(f"Wrote {', '.join(images)} and {args.out}.S ({len(prog.words)} words)")
     print(f"Test '{args.test}': Check x31==0 for PASS, x30 for status marker")
 
 if __name__ == "__main__":
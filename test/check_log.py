@@ -13,6 +13,10 @@
 
 from __future__ import annotations
 
+import re
+from functools import lru_cache
+from operator import itemgetter
+
 # ------------------------------------------------------------
 # RISC-V opcode maps (must match your RTL uop_op_e numbering)
 # ------------------------------------------------------------
@@ -36,24 +40,18 @@ OP = {
 # Load hex program (readmemh-style, one word per line)
 # ------------------------------------------------------------
 def load_hex(path: str):
-    mem = {}
-    pc = 0
     with open(path) as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            mem[pc] = int(line, 16) & 0xFFFF_FFFF
-            pc += 4
-    return mem
+        # int() ignores surrounding whitespace; blank lines take no address
+        words = [int(line, 16) & 0xFFFF_FFFF for line in f.read().splitlines() if line.strip()]
+    return dict(zip(range(0, 4 * len(words), 4), words))
 
 # ------------------------------------------------------------
 # Immediate extract
 # ------------------------------------------------------------
 def signext(x: int, bits: int) -> int:
-    if (x >> (bits - 1)) & 1:
-        return x | (-1 << bits)
-    return x
+    # x is a bits-wide field; flipping then subtracting the sign bit extends it
+    m = 1 << (bits - 1)
+    return (x ^ m) - m
 
 def imm_i(ins: int) -> int:
     return signext((ins >> 20) & 0xFFF, 12)
@@ -76,114 +74,159 @@ def imm_j(ins: int) -> int:
 # Golden decode (matches your RTL decode conventions)
 # - For shift-immediates, returns imm_i(ins) (funct7<<5 | shamt) to match RTL d.imm=imm_i
 # ------------------------------------------------------------
+# Operand form -> (rs1, rs2, rd, imm) from the raw fields
+FORMS = {
+    "R": lambda ins, rs1, rs2, rd: (rs1, rs2, rd, 0),
+    "I": lambda ins, rs1, rs2, rd: (rs1, 0, rd, imm_i(ins)),
+    "S": lambda ins, rs1, rs2, rd: (rs1, rs2, 0, imm_s_fn(ins)),
+    "B": lambda ins, rs1, rs2, rd: (rs1, rs2, 0, imm_b(ins)),
+    "J": lambda ins, rs1, rs2, rd: (0, 0, rd, imm_j(ins)),
+    "U": lambda ins, rs1, rs2, rd: (0, 0, rd, imm_u(ins)),
+}
+
+# (opcode, funct3 or None = any, funct7 or None = any, name, form)
+DECODE_SPEC = [
+    (0x33, 0, 0x00, "ADD",  "R"), (0x33, 0, 0x20, "SUB",  "R"),
+    (0x33, 7, None, "AND",  "R"), (0x33, 6, None, "OR",   "R"),
+    (0x33, 4, None, "XOR",  "R"), (0x33, 1, None, "SLL",  "R"),
+    (0x33, 5, 0x00, "SRL",  "R"), (0x33, 5, 0x20, "SRA",  "R"),
+    (0x33, 2, None, "SLT",  "R"), (0x33, 3, None, "SLTU", "R"),
+
+    (0x13, 0, None, "ADDI", "I"), (0x13, 7, None, "ANDI",  "I"),
+    (0x13, 6, None, "ORI",  "I"), (0x13, 4, None, "XORI",  "I"),
+    (0x13, 2, None, "SLTI", "I"), (0x13, 3, None, "SLTIU", "I"),
+    # Match RTL: d.imm = imm_i(fetch_inst) for shifts, not just shamt
+    (0x13, 1, 0x00, "SLLI", "I"), (0x13, 5, 0x00, "SRLI",  "I"),
+    (0x13, 5, 0x20, "SRAI", "I"),
+
+    (0x03, 0, None, "LB",  "I"), (0x03, 1, None, "LH",  "I"),
+    (0x03, 2, None, "LW",  "I"), (0x03, 4, None, "LBU", "I"),
+    (0x03, 5, None, "LHU", "I"),
+
+    (0x23, 0, None, "SB", "S"), (0x23, 1, None, "SH", "S"),
+    (0x23, 2, None, "SW", "S"),
+
+    (0x63, 0, None, "BEQ",  "B"), (0x63, 1, None, "BNE",  "B"),
+    (0x63, 4, None, "BLT",  "B"), (0x63, 5, None, "BGE",  "B"),
+    (0x63, 6, None, "BLTU", "B"), (0x63, 7, None, "BGEU", "B"),
+
+    (0x6F, None, None, "JAL",   "J"),
+    (0x67, None, None, "JALR",  "I"),
+    (0x37, None, None, "LUI",   "U"),
+    (0x17, None, None, "AUIPC", "U"),
+]
+
+def _build_decode_table():
+    """
+    opcode | funct3 << 7 -> (name, form), or {funct7: (name, form)} where
+    funct7 selects the instruction
+    """
+    table = {}
+    for opc, f3, f7, name, form in DECODE_SPEC:
+        for k in ([f3] if f3 is not None else range(8)):
+            key = opc | (k << 7)
+            if f7 is None:
+                table[key] = (name, FORMS[form])
+            else:
+                table.setdefault(key, {})[f7] = (name, FORMS[form])
+    return table
+
+DECODE_TABLE = _build_decode_table()
+
 def decode(ins: int):
-    opc = ins & 0x7F
-    rd  = (ins >> 7) & 0x1F
-    f3  = (ins >> 12) & 7
-    rs1 = (ins >> 15) & 0x1F
-    rs2 = (ins >> 20) & 0x1F
-    f7  = (ins >> 25) & 0x7F
-
-    if opc == 0x33:   # R
-        if f3==0 and f7==0x00: return ("ADD",  rs1, rs2, rd, 0)
-        if f3==0 and f7==0x20: return ("SUB",  rs1, rs2, rd, 0)
-        if f3==7:              return ("AND",  rs1, rs2, rd, 0)
-        if f3==6:              return ("OR",   rs1, rs2, rd, 0)
-        if f3==4:              return ("XOR",  rs1, rs2, rd, 0)
-        if f3==1:              return ("SLL",  rs1, rs2, rd, 0)
-        if f3==5 and f7==0x00: return ("SRL",  rs1, rs2, rd, 0)
-        if f3==5 and f7==0x20: return ("SRA",  rs1, rs2, rd, 0)
-        if f3==2:              return ("SLT",  rs1, rs2, rd, 0)
-        if f3==3:              return ("SLTU", rs1, rs2, rd, 0)
-
-    if opc == 0x13:   # I-ALU
-        if f3==0: return ("ADDI",  rs1, 0, rd, imm_i(ins))
-        if f3==7: return ("ANDI",  rs1, 0, rd, imm_i(ins))
-        if f3==6: return ("ORI",   rs1, 0, rd, imm_i(ins))
-        if f3==4: return ("XORI",  rs1, 0, rd, imm_i(ins))
-        if f3==2: return ("SLTI",  rs1, 0, rd, imm_i(ins))
-        if f3==3: return ("SLTIU", rs1, 0, rd, imm_i(ins))
-
-        # Match RTL: d.imm = imm_i(fetch_inst) for shifts, not just shamt
-        if f3==1 and f7==0x00: return ("SLLI",  rs1, 0, rd, imm_i(ins))
-        if f3==5 and f7==0x00: return ("SRLI",  rs1, 0, rd, imm_i(ins))
-        if f3==5 and f7==0x20: return ("SRAI",  rs1, 0, rd, imm_i(ins))
-
-    if opc == 0x03:   # Loads
-        if f3==0: return ("LB",  rs1, 0, rd, imm_i(ins))
-        if f3==1: return ("LH",  rs1, 0, rd, imm_i(ins))
-        if f3==2: return ("LW",  rs1, 0, rd, imm_i(ins))
-        if f3==4: return ("LBU", rs1, 0, rd, imm_i(ins))
-        if f3==5: return ("LHU", rs1, 0, rd, imm_i(ins))
-
-    if opc == 0x23:   # Stores
-        if f3==0: return ("SB", rs1, rs2, 0, imm_s_fn(ins))
-        if f3==1: return ("SH", rs1, rs2, 0, imm_s_fn(ins))
-        if f3==2: return ("SW", rs1, rs2, 0, imm_s_fn(ins))
-
-    if opc == 0x63:   # Branches
-        if f3==0: return ("BEQ",  rs1, rs2, 0, imm_b(ins))
-        if f3==1: return ("BNE",  rs1, rs2, 0, imm_b(ins))
-        if f3==4: return ("BLT",  rs1, rs2, 0, imm_b(ins))
-        if f3==5: return ("BGE",  rs1, rs2, 0, imm_b(ins))
-        if f3==6: return ("BLTU", rs1, rs2, 0, imm_b(ins))
-        if f3==7: return ("BGEU", rs1, rs2, 0, imm_b(ins))
-
-    if opc == 0x6F: return ("JAL",   0,   0, rd, imm_j(ins))
-    if opc == 0x67: return ("JALR",  rs1, 0, rd, imm_i(ins))
-    if opc == 0x37: return ("LUI",   0,   0, rd, imm_u(ins))
-    if opc == 0x17: return ("AUIPC", 0,   0, rd, imm_u(ins))
-
-    return None
+    ent = DECODE_TABLE.get((ins & 0x7F) | ((ins >> 5) & 0x380))  # opcode | funct3 << 7
+    if type(ent) is dict:
+        ent = ent.get(ins >> 25)
+    if ent is None:
+        return None
+    name, form = ent
+    return (name,) + form(ins, (ins >> 15) & 0x1F, (ins >> 20) & 0x1F, (ins >> 7) & 0x1F)
+
+def decode_program(mem: dict):
+    """
+    pc -> (ins, golden decode, golden_check) for every word in mem (decode
+    and check are None for padding/data), so the trace loop needs one
+    lookup per line
+    """
+    prog = {}
+    for pc, ins in mem.items():
+        ref = decode(ins)
+        prog[pc] = (ins, ref, golden_check(ref) if ref is not None else None)
+    return prog
 
 # ------------------------------------------------------------
 # Field usage gating (avoid comparing don't-care fields from encoding)
 # ------------------------------------------------------------
+USES_RS1 = frozenset({
+    # R
+    "ADD","SUB","AND","OR","XOR","SLL","SRL","SRA","SLT","SLTU",
+    # I-ALU
+    "ADDI","ANDI","ORI","XORI","SLLI","SRLI","SRAI","SLTI","SLTIU",
+    # loads/stores
+    "LB","LH","LW","LBU","LHU","SB","SH","SW",
+    # branches
+    "BEQ","BNE","BLT","BGE","BLTU","BGEU",
+    # jalr
+    "JALR",
+})
+
+USES_RS2 = frozenset({
+    # R
+    "ADD","SUB","AND","OR","XOR","SLL","SRL","SRA","SLT","SLTU",
+    # stores
+    "SB","SH","SW",
+    # branches
+    "BEQ","BNE","BLT","BGE","BLTU","BGEU",
+})
+
+WRITES_RD = frozenset({
+    # R
+    "ADD","SUB","AND","OR","XOR","SLL","SRL","SRA","SLT","SLTU",
+    # I-ALU
+    "ADDI","ANDI","ORI","XORI","SLLI","SRLI","SRAI","SLTI","SLTIU",
+    # loads
+    "LB","LH","LW","LBU","LHU",
+    # jumps and upper immediates
+    "JAL","JALR","LUI","AUIPC",
+})
+
 def uses_rs1(name: str) -> bool:
-    return name in {
-        # R
-        "ADD","SUB","AND","OR","XOR","SLL","SRL","SRA","SLT","SLTU",
-        # I-ALU
-        "ADDI","ANDI","ORI","XORI","SLLI","SRLI","SRAI","SLTI","SLTIU",
-        # loads/stores
-        "LB","LH","LW","LBU","LHU","SB","SH","SW",
-        # branches
-        "BEQ","BNE","BLT","BGE","BLTU","BGEU",
-        # jalr
-        "JALR",
-    }
+    return name in USES_RS1
 
 def uses_rs2(name: str) -> bool:
-    return name in {
-        # R
-        "ADD","SUB","AND","OR","XOR","SLL","SRL","SRA","SLT","SLTU",
-        # stores
-        "SB","SH","SW",
-        # branches
-        "BEQ","BNE","BLT","BGE","BLTU","BGEU",
-    }
+    return name in USES_RS2
 
 def writes_rd(name: str) -> bool:
-    return name in {
-        # R
-        "ADD","SUB","AND","OR","XOR","SLL","SRL","SRA","SLT","SLTU",
-        # I-ALU
-        "ADDI","ANDI","ORI","XORI","SLLI","SRLI","SRAI","SLTI","SLTIU",
-        # loads
-        "LB","LH","LW","LBU","LHU",
-        # jumps and upper immediates
-        "JAL","JALR","LUI","AUIPC",
-    }
+    return name in WRITES_RD
+
+def golden_check(ref):
+    """
+    (pick, want) for a decoded instruction: pick selects the fields it
+    defines from a parse_fetch_line tuple, want holds their golden values,
+    so one tuple compare covers op, the gated registers and imm
+    """
+    name, r1, r2, rd0, imm0 = ref
+    idx, want = [1], [OP[name]]
+    if name in USES_RS1:
+        idx.append(2); want.append(r1)
+    if name in USES_RS2:
+        idx.append(3); want.append(r2)
+    if name in WRITES_RD:
+        idx.append(4); want.append(rd0)
+    idx.append(5); want.append(imm0 & 0xFFFF_FFFF)
+    return itemgetter(*idx), tuple(want)
 
 # ------------------------------------------------------------
 # Trace parsing helpers for key=value tokens
 # ------------------------------------------------------------
-def parse_kv(tok: str):
-    if "=" not in tok:
-        return None, None
-    k, v = tok.split("=", 1)
-    return k.strip(), v.strip()
+# One whitespace-delimited token: key up to the first '=', value is the rest
+KV_RE = re.compile(r"(?<!\S)([^\s=]*)=(\S*)")
+
+# Token prefixes of a fetch_trace.log line as the RTL tracer writes it
+TRACE_LAYOUT = ("PC=", "class=", "op=", "br=", "rs1=", "rs2=", "rd=", "imm=", "predT=", "predTGT=")
 
+# Field strings repeat across lines too (register numbers, opcodes)
+@lru_cache(maxsize=None)
 def parse_int_maybe(v: str, base: int):
     v = v.strip()
     if v.lower() == "x":
@@ -196,8 +239,47 @@ def parse_int_maybe(v: str, base: int):
         v = v[2:]
     return int(v, base)
 
+# A loop re-fetches the same instructions, so whole trace lines repeat
+# verbatim; parsing is memoized per line
+@lru_cache(maxsize=1 << 16)
+def parse_fetch_line(line: str):
+    """
+    (pc, op, rs1, rs2, rd, imm) from a PC= line, imm as 32-bit unsigned;
+    None if a field is missing or x
+    """
+    parts = line.split()
+    if len(parts) == 10 and all(map(str.startswith, parts, TRACE_LAYOUT)):
+        # The tracer's own layout: every key is in its slot exactly once
+        pc_s, op_s = parts[0][3:], parts[2][3:]
+        rs1_s, rs2_s, rd_s, imm_hex_str = parts[4][4:], parts[5][4:], parts[6][3:], parts[7][4:]
+    else:
+        kv = dict(KV_RE.findall(line))
+
+        pc_s  = kv.get("PC")
+        op_s  = kv.get("op")
+        rs1_s = kv.get("rs1")
+        rs2_s = kv.get("rs2")
+        rd_s  = kv.get("rd")
+        imm_hex_str = kv.get("imm")  # do NOT name this imm_s
+
+    if None in (pc_s, op_s, rs1_s, rs2_s, rd_s, imm_hex_str):
+        return None
+
+    fields = (parse_int_maybe(pc_s, 16),
+              parse_int_maybe(op_s, 10),
+              parse_int_maybe(rs1_s, 10),
+              parse_int_maybe(rs2_s, 10),
+              parse_int_maybe(rd_s, 10),
+              parse_int_maybe(imm_hex_str, 16))
+
+    # skip x / unparsable
+    if None in fields:
+        return None
+    # compare immediates as 32-bit unsigned
+    return fields[:5] + (fields[5] & 0xFFFF_FFFF,)
+
 def main():
-    mem = load_hex("prog.hex")
+    prog = decode_program(load_hex("prog.hex"))
 
     bad = 0
     seen = 0
@@ -210,70 +292,29 @@ def main():
             if not line.startswith("PC="):
                 continue
 
-            toks = line.split()
-            kv = {}
-            for t in toks:
-                k, v = parse_kv(t)
-                if k is not None:
-                    kv[k] = v
-
-            pc_s  = kv.get("PC")
-            op_s  = kv.get("op")
-            rs1_s = kv.get("rs1")
-            rs2_s = kv.get("rs2")
-            rd_s  = kv.get("rd")
-            imm_hex_str = kv.get("imm")  # do NOT name this imm_s
-
-            if None in (pc_s, op_s, rs1_s, rs2_s, rd_s, imm_hex_str):
-                skipped_parse += 1
-                continue
-
-            pc  = parse_int_maybe(pc_s, 16)
-            op  = parse_int_maybe(op_s, 10)
-            rs1 = parse_int_maybe(rs1_s, 10)
-            rs2 = parse_int_maybe(rs2_s, 10)
-            rd  = parse_int_maybe(rd_s, 10)
-            imm = parse_int_maybe(imm_hex_str, 16)
-
-            # skip x / unparsable
-            if None in (pc, op, rs1, rs2, rd, imm):
+            fields = parse_fetch_line(line)
+            if fields is None:
                 skipped_parse += 1
                 continue
+            pc, op, rs1, rs2, rd, imm = fields
 
-            ins = mem.get(pc)
-            if ins is None:
+            ent = prog.get(pc)
+            if ent is None:
                 skipped_not_in_hex += 1
                 continue
 
-            ref = decode(ins)
+            ins, ref, check = ent
             if ref is None:
                 # padding/data: ignore
                 continue
 
-            name, r1, r2, rd0, imm0 = ref
-            exp_op = OP[name]
-
-            # compare immediates as 32-bit unsigned
-            imm_rtl = imm & 0xFFFF_FFFF
-            imm_ref = imm0 & 0xFFFF_FFFF
-
-            mismatch = False
-            if op != exp_op:
-                mismatch = True
-            if uses_rs1(name) and (rs1 != r1):
-                mismatch = True
-            if uses_rs2(name) and (rs2 != r2):
-                mismatch = True
-            if writes_rd(name) and (rd != rd0):
-                mismatch = True
-            if imm_rtl != imm_ref:
-                mismatch = True
-
-            if mismatch:
+            pick, want = check
+            if pick(fields) != want:
+                name, r1, r2, rd0, imm0 = ref
                 bad += 1
                 print(f"Mismatch @ PC {pc:08x} ins={ins:08x}")
-                print(f"  RTL: op={op} rs1={rs1} rs2={rs2} rd={rd} imm=0x{imm_rtl:08x}")
-                print(f"  REF: {name} op={exp_op} rs1={r1} rs2={r2} rd={rd0} imm=0x{imm_ref:08x}")
+                print(f"  RTL: op={op} rs1={rs1} rs2={rs2} rd={rd} imm=0x{imm:08x}")
+                print(f"  REF: {name} op={OP[name]} rs1={r1} rs2={r2} rd={rd0} imm=0x{imm0 & 0xFFFF_FFFF:08x}")
 
             seen += 1
 
@@ -11,61 +11,66 @@ Usage:
   python check_redirect.py fetch_trace.log
 """
 
+import mmap
+import os
 import re
 import sys
-from dataclasses import dataclass
 
 MAX_LAT = 3  # must match tb_fetch_redirect.sv
 
 RE_PC = re.compile(r"\bPC=([0-9a-fA-F]{8})\b")
 RE_REDIRECT = re.compile(r"^REDIRECT\s+to=([0-9a-fA-F]{8})\s*$")
 
-@dataclass
-class Pending:
-    tgt: int
-    budget: int
+# RE_REDIRECT / RE_PC as one pass over the whole mapped log, one match per
+# event line: a whole-line REDIRECT (group 1; surrounding blanks allowed but
+# never a newline), else the first PC= on a line (group 2), consuming the
+# rest of that line so a second PC= on it is not counted
+RE_EVENT = re.compile(rb"^[ \t\r\f\v]*REDIRECT[ \t\r\f\v]+to=([0-9a-fA-F]{8})[ \t\r\f\v]*$"
+                      rb"|\bPC=([0-9a-fA-F]{8})\b[^\n]*", re.M)
+
+def map_trace(f):
+    """Read-only bytes view of an open trace file (mmap rejects empty files)"""
+    if os.fstat(f.fileno()).st_size == 0:
+        return memoryview(b"")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 
 def main():
     path = sys.argv[1] if len(sys.argv) > 1 else "fetch_trace.log"
 
-    pend: Pending | None = None
+    # Pending redirect: target PC (None if none) and remaining uop budget
+    pend_tgt: int | None = None
+    budget = 0
     total_uops = 0
     redirects = 0
 
-    with open(path, "r") as f:
-        for ln, line in enumerate(f, 1):
-            line = line.strip()
-
-            m = RE_REDIRECT.match(line)
-            if m:
-                tgt = int(m.group(1), 16)
-                if pend is not None:
-                    print(f"ERROR: redirect at line {ln} while previous redirect still pending (tgt={pend.tgt:08x}).")
+    with open(path, "rb") as f, map_trace(f) as buf:
+        for m in RE_EVENT.finditer(buf):
+            redirect_s, pc_s = m.groups()
+            if redirect_s is not None:
+                if pend_tgt is not None:
+                    ln = buf[:m.start()].count(b"\n") + 1
+                    print(f"ERROR: redirect at line {ln} while previous redirect still pending (tgt={pend_tgt:08x}).")
                     return 2
-                pend = Pending(tgt=tgt, budget=MAX_LAT)
+                pend_tgt = int(redirect_s, 16)
+                budget = MAX_LAT
                 redirects += 1
                 continue
 
-            m = RE_PC.search(line)
-            if not m:
-                continue
-
-            pc = int(m.group(1), 16)
             total_uops += 1
 
-            if pend is not None:
-                if pc == pend.tgt:
+            if pend_tgt is not None:
+                if int(pc_s, 16) == pend_tgt:
                     # success
-                    pend = None
+                    pend_tgt = None
                 else:
-                    pend.budget -= 1
-                    if pend.budget < 0:
-                        print(f"FAIL: Did not observe redirected PC={pend.tgt:08x} within {MAX_LAT} decoded uops after redirect")
+                    budget -= 1
+                    if budget < 0:
+                        print(f"FAIL: Did not observe redirected PC={pend_tgt:08x} within {MAX_LAT} decoded uops after redirect")
                         return 1
 
-    if pend is not None:
-        print(f"FAIL: log ended while redirect to PC={pend.tgt:08x} still pending")
+    if pend_tgt is not None:
+        print(f"FAIL: log ended while redirect to PC={pend_tgt:08x} still pending")
         return 1
 
     print(f"✓ Redirect behavior looks OK ({redirects} redirect events checked, {total_uops} decoded uops scanned)")
@@ -11,71 +11,109 @@
 #
 # Output: prog.hex (one 32-bit word per line, hex)
 
+import struct
+from array import array
 from typing import List
 
-def mask(n, bits): return n & ((1 << bits) - 1)
-
 def encode_R(opcode, rd, funct3, rs1, rs2, funct7):
-    return ((mask(funct7,7) << 25) |
-            (mask(rs2,5)   << 20) |
-            (mask(rs1,5)   << 15) |
-            (mask(funct3,3)<< 12) |
-            (mask(rd,5)    << 7)  |
-            mask(opcode,7))
+    return (((funct7 & 0x7F) << 25) |
+            ((rs2 & 0x1F)    << 20) |
+            ((rs1 & 0x1F)    << 15) |
+            ((funct3 & 0x7)  << 12) |
+            ((rd & 0x1F)     << 7)  |
+            (opcode & 0x7F))
 
 def encode_I(opcode, rd, funct3, rs1, imm):
-    imm12 = mask(imm, 12)
-    return ((imm12          << 20) |
-            (mask(rs1,5)    << 15) |
-            (mask(funct3,3) << 12) |
-            (mask(rd,5)     << 7)  |
-            mask(opcode,7))
+    return (((imm & 0xFFF)   << 20) |
+            ((rs1 & 0x1F)    << 15) |
+            ((funct3 & 0x7)  << 12) |
+            ((rd & 0x1F)     << 7)  |
+            (opcode & 0x7F))
 
 def encode_S(opcode, funct3, rs1, rs2, imm):
-    imm12  = mask(imm, 12)
-    imm_hi = (imm12 >> 5) & 0x7F
-    imm_lo = imm12 & 0x1F
-    return ((imm_hi         << 25) |
-            (mask(rs2,5)    << 20) |
-            (mask(rs1,5)    << 15) |
-            (mask(funct3,3) << 12) |
-            (imm_lo         << 7)  |
-            mask(opcode,7))
+    return ((((imm >> 5) & 0x7F) << 25) |
+            ((rs2 & 0x1F)        << 20) |
+            ((rs1 & 0x1F)        << 15) |
+            ((funct3 & 0x7)      << 12) |
+            ((imm & 0x1F)        << 7)  |
+            (opcode & 0x7F))
 
 def encode_B(opcode, funct3, rs1, rs2, imm):
     # imm is byte offset; must be multiple of 2.
-    imm13 = mask(imm, 13)
-    b12   = (imm13 >> 12) & 1
-    b11   = (imm13 >> 11) & 1
-    b10_5 = (imm13 >> 5)  & 0x3F
-    b4_1  = (imm13 >> 1)  & 0xF
-    return ((b12            << 31) |
-            (b10_5          << 25) |
-            (mask(rs2,5)    << 20) |
-            (mask(rs1,5)    << 15) |
-            (mask(funct3,3) << 12) |
-            (b4_1           << 8)  |
-            (b11            << 7)  |
-            mask(opcode,7))
+    return ((((imm >> 12) & 1)    << 31) |
+            (((imm >> 5)  & 0x3F) << 25) |
+            ((rs2 & 0x1F)         << 20) |
+            ((rs1 & 0x1F)         << 15) |
+            ((funct3 & 0x7)       << 12) |
+            (((imm >> 1)  & 0xF)  << 8)  |
+            (((imm >> 11) & 1)    << 7)  |
+            (opcode & 0x7F))
 
 def encode_U(opcode, rd, imm20):
-    return ((mask(imm20,20) << 12) |
-            (mask(rd,5)     << 7)  |
-            mask(opcode,7))
+    return (((imm20 & 0xFFFFF) << 12) |
+            ((rd & 0x1F)       << 7)  |
+            (opcode & 0x7F))
 
 def encode_J(opcode, rd, imm):
     # imm is byte offset; must be multiple of 2
-    imm21  = mask(imm, 21)
-    j20    = (imm21 >> 20) & 1
-    j10_1  = (imm21 >> 1)  & 0x3FF
-    j11    = (imm21 >> 11) & 1
-    j19_12 = (imm21 >> 12) & 0xFF
-    return ((j20            << 31) |
-            (j19_12         << 12) |
-            (j11            << 20) |
-            (j10_1          << 21) |
-            (mask(rd,5)     << 7)  |
-            mask(opcode,7))
+    return ((((imm >> 20) & 1)     << 31) |
+            (((imm >> 12) & 0xFF)  << 12) |
+            (((imm >> 11) & 1)     << 20) |
+            (((imm >> 1)  & 0x3FF) << 21) |
+            ((rd & 0x1F)           << 7)  |
+            (opcode & 0x7F))
+
+# -------------------------
+# Per-mnemonic encoders: opcode/funct3/funct7 are folded into one constant
+# at import, so a call only masks and shifts its operand fields
+# -------------------------
+def _gen_R(opcode, funct3, funct7):
+    base = encode_R(opcode, 0, funct3, 0, 0, funct7)
+    def enc(rd, rs1, rs2):
+        return base | ((rs2 & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | ((rd & 0x1F) << 7)
+    return enc
+
+def _gen_I(opcode, funct3):
+    base = encode_I(opcode, 0, funct3, 0, 0)
+    def enc(rd, rs1, imm):
+        return base | ((imm & 0xFFF) << 20) | ((rs1 & 0x1F) << 15) | ((rd & 0x1F) << 7)
+    return enc
+
+def _gen_S(opcode, funct3):
+    base = encode_S(opcode, funct3, 0, 0, 0)
+    def enc(rs2, rs1, imm):
+        return (base | (((imm >> 5) & 0x7F) << 25) | ((rs2 & 0x1F) << 20) |
+                ((rs1 & 0x1F) << 15) | ((imm & 0x1F) << 7))
+    return enc
+
+def _gen_B(opcode, funct3):
+    base = encode_B(opcode, funct3, 0, 0, 0)
+    def enc(rs1, rs2, off):
+        # off is a byte offset; must be multiple of 2
+        return (base |
+                (((off >> 12) & 1)    << 31) |
+                (((off >> 5)  & 0x3F) << 25) |
+                ((rs2 & 0x1F)         << 20) |
+                ((rs1 & 0x1F)         << 15) |
+                (((off >> 1)  & 0xF)  << 8)  |
+                (((off >> 11) & 1)    << 7))
+    return enc
+
+def _gen_U(opcode):
+    def enc(rd, imm20):
+        return ((imm20 & 0xFFFFF) << 12) | ((rd & 0x1F) << 7) | opcode
+    return enc
+
+def _gen_J(opcode):
+    def enc(rd, off):
+        # off is a byte offset; must be multiple of 2
+        return ((((off >> 20) & 1)     << 31) |
+                (((off >> 12) & 0xFF)  << 12) |
+                (((off >> 11) & 1)     << 20) |
+                (((off >> 1)  & 0x3FF) << 21) |
+                ((rd & 0x1F)           << 7)  |
+                opcode)
+    return enc
 
 # -------------------------
 # RV32I convenience wrappers
@@ -83,50 +121,54 @@ def encode_J(opcode, rd, imm):
 def NOP(): return encode_I(0x13, 0, 0x0, 0, 0)  # addi x0,x0,0
 
 # I-type ALU
-def ADDI(rd, rs1, imm):  return encode_I(0x13, rd, 0x0, rs1, imm)
-def SLTI(rd, rs1, imm):  return encode_I(0x13, rd, 0x2, rs1, imm)
-def SLTIU(rd, rs1, imm): return encode_I(0x13, rd, 0x3, rs1, imm)
-def XORI(rd, rs1, imm):  return encode_I(0x13, rd, 0x4, rs1, imm)
-def ORI(rd, rs1, imm):   return encode_I(0x13, rd, 0x6, rs1, imm)
-def ANDI(rd, rs1, imm):  return encode_I(0x13, rd, 0x7, rs1, imm)
-def SLLI(rd, rs1, sh):   return encode_I(0x13, rd, 0x1, rs1, sh)  # funct7=0 implicit
-def SRLI(rd, rs1, sh):   return encode_I(0x13, rd, 0x5, rs1, sh)  # funct7=0 implicit
-def SRAI(rd, rs1, sh):   return encode_I(0x13, rd, 0x5, rs1, (0x20 << 5) | (sh & 0x1F))
+ADDI  = _gen_I(0x13, 0x0)
+SLTI  = _gen_I(0x13, 0x2)
+SLTIU = _gen_I(0x13, 0x3)
+XORI  = _gen_I(0x13, 0x4)
+ORI   = _gen_I(0x13, 0x6)
+ANDI  = _gen_I(0x13, 0x7)
+SLLI  = _gen_I(0x13, 0x1)  # funct7=0 implicit
+SRLI  = _gen_I(0x13, 0x5)  # funct7=0 implicit
+def SRAI(rd, rs1, sh):   return SRLI(rd, rs1, (0x20 << 5) | (sh & 0x1F))
 
 # R-type ALU
-def ADD(rd, rs1, rs2):  return encode_R(0x33, rd, 0x0, rs1, rs2, 0x00)
-def SUB(rd, rs1, rs2):  return encode_R(0x33, rd, 0x0, rs1, rs2, 0x20)
-def SLL(rd, rs1, rs2):  return encode_R(0x33, rd, 0x1, rs1, rs2, 0x00)
-def SLT(rd, rs1, rs2):  return encode_R(0x33, rd, 0x2, rs1, rs2, 0x00)
-def SLTU(rd, rs1, rs2): return encode_R(0x33, rd, 0x3, rs1, rs2, 0x00)
-def XOR(rd, rs1, rs2):  return encode_R(0x33, rd, 0x4, rs1, rs2, 0x00)
-def SRL(rd, rs1, rs2):  return encode_R(0x33, rd, 0x5, rs1, rs2, 0x00)
-def SRA(rd, rs1, rs2):  return encode_R(0x33, rd, 0x5, rs1, rs2, 0x20)
-def OR(rd, rs1, rs2):   return encode_R(0x33, rd, 0x6, rs1, rs2, 0x00)
-def AND(rd, rs1, rs2):  return encode_R(0x33, rd, 0x7, rs1, rs2, 0x00)
+ADD  = _gen_R(0x33, 0x0, 0x00)
+SUB  = _gen_R(0x33, 0x0, 0x20)
+SLL  = _gen_R(0x33, 0x1, 0x00)
+SLT  = _gen_R(0x33, 0x2, 0x00)
+SLTU = _gen_R(0x33, 0x3, 0x00)
+XOR  = _gen_R(0x33, 0x4, 0x00)
+SRL  = _gen_R(0x33, 0x5, 0x00)
+SRA  = _gen_R(0x33, 0x5, 0x20)
+OR   = _gen_R(0x33, 0x6, 0x00)
+AND  = _gen_R(0x33, 0x7, 0x00)
 
 # Branches
-def BEQ(rs1, rs2, off):  return encode_B(0x63, 0x0, rs1, rs2, off)
-def BNE(rs1, rs2, off):  return encode_B(0x63, 0x1, rs1, rs2, off)
-def BLT(rs1, rs2, off):  return encode_B(0x63, 0x4, rs1, rs2, off)
-def BGE(rs1, rs2, off):  return encode_B(0x63, 0x5, rs1, rs2, off)
-def BLTU(rs1, rs2, off): return encode_B(0x63, 0x6, rs1, rs2, off)
-def BGEU(rs1, rs2, off): return encode_B(0x63, 0x7, rs1, rs2, off)
+BEQ  = _gen_B(0x63, 0x0)
+BNE  = _gen_B(0x63, 0x1)
+BLT  = _gen_B(0x63, 0x4)
+BGE  = _gen_B(0x63, 0x5)
+BLTU = _gen_B(0x63, 0x6)
+BGEU = _gen_B(0x63, 0x7)
 
 # Jumps / upper immediates
-def LUI(rd, imm20):    return encode_U(0x37, rd, imm20)
-def AUIPC(rd, imm20):  return encode_U(0x17, rd, imm20)
-def JAL(rd, off):      return encode_J(0x6F, rd, off)
-def JALR(rd, rs1, imm):return encode_I(0x67, rd, 0x0, rs1, imm)
+LUI   = _gen_U(0x37)
+AUIPC = _gen_U(0x17)
+JAL   = _gen_J(0x6F)
+JALR  = _gen_I(0x67, 0x0)
 
 # Loads/stores (only LW/SW here; extend if you want)
-def LW(rd, rs1, imm):  return encode_I(0x03, rd, 0x2, rs1, imm)
-def SW(rs2, rs1, imm): return encode_S(0x23, 0x2, rs1, rs2, imm)
+LW = _gen_I(0x03, 0x2)
+SW = _gen_S(0x23, 0x2)
+
+# Branch mnemonic -> encoder, for label fixups
+BR_ENC = {"BEQ": BEQ, "BNE": BNE, "BLT": BLT, "BGE": BGE, "BLTU": BLTU, "BGEU": BGEU}
 
 def write_hex(path: str, words: List[int]):
+    # Big-endian pack + bytes.hex() separator gives 8 hex digits per word
+    body = struct.pack(f">{len(words)}I", *(w & 0xFFFFFFFF for w in words)).hex("\n", 4)
     with open(path, "w") as f:
-        for w in words:
-            f.write(f"{w & 0xFFFFFFFF:08x}\n")
+        f.write(body + "\n" if body else "")
 
 
 def write_asm(path: str, words: List[int], labels: dict, asm_lines: List[str]):
@@ -134,23 +176,25 @@ def write_asm(path: str, words: List[int], labels: dict, asm_lines: List[str]):
     pc_to_labels = {}
     for name, pc in labels.items():
         pc_to_labels.setdefault(pc, []).append(name)
+    out = []
+    for i, (w, asm) in enumerate(zip(words, asm_lines)):
+        pc = 4 * i
+        if pc in pc_to_labels:
+            out.extend(f"{name}:\n" for name in sorted(pc_to_labels[pc]))
+        out.append(f"{pc:08x}: {w & 0xFFFFFFFF:08x}    {asm}\n")
     with open(path, "w") as f:
-        for i, (w, asm) in enumerate(zip(words, asm_lines)):
-            pc = 4 * i
-            if pc in pc_to_labels:
-                for name in sorted(pc_to_labels[pc]):
-                    f.write(f"{name}:\n")
-            f.write(f"{pc:08x}: {w & 0xFFFFFFFF:08x}    {asm}\n")
+        f.write("".join(out))
 
 # -------------------------
 # Small "assembler" helpers for labels
 # -------------------------
 class Asm:
     def __init__(self):
-        self.words: List[int] = []
+        self.words: array = array("I")  # packed uint32 instruction words
         self.asm_lines: List[str] = []   # 1:1 with words
         self.labels = {}      # name -> pc
-        self.fixups = []      # (idx, kind, args...)
+        self._b_fix   = []    # (idx, which, rs1, rs2, label)
+        self._jal_fix = []    # (idx, rd, label)
 
     @property
     def pc(self) -> int:
@@ -167,38 +211,26 @@ class Asm:
     def emit_b(self, which: str, rs1: int, rs2: int, label: str):
         idx = len(self.words)
         self.emit(NOP(), f"{which.lower()} x{rs1}, x{rs2}, {label}")  # placeholder word
-        self.fixups.append((idx, "B", which, rs1, rs2, label))
+        self._b_fix.append((idx, which, rs1, rs2, label))
 
     # JAL to label (patched later)
     def emit_jal(self, rd: int, label: str):
         idx = len(self.words)
         self.emit(NOP(), f"jal x{rd}, {label}")  # placeholder word
-        self.fixups.append((idx, "JAL", rd, label))
+        self._jal_fix.append((idx, rd, label))
 
     def patch(self):
-        for fx in self.fixups:
-            idx = fx[0]
-            kind = fx[1]
-            pc_here = 4 * idx
-            if kind == "B":
-                _, _, which, rs1, rs2, label = fx
-                target = self.labels[label]
-                off = target - pc_here
-                if off % 2 != 0:
-                    raise ValueError(f"Branch offset not 2-byte aligned: {label} off={off}")
-                ins = {
-                    "BEQ": BEQ, "BNE": BNE, "BLT": BLT, "BGE": BGE, "BLTU": BLTU, "BGEU": BGEU
-                }[which](rs1, rs2, off)
-                self.words[idx] = ins
-            elif kind == "JAL":
-                _, _, rd, label = fx
-                target = self.labels[label]
-                off = target - pc_here
-                if off % 2 != 0:
-                    raise ValueError(f"JAL offset not 2-byte aligned: {label} off={off}")
-                self.words[idx] = JAL(rd, off)
-            else:
-                raise ValueError(f"Unknown fixup kind {kind}")
+        words, labels = self.words, self.labels
+        for idx, which, rs1, rs2, label in self._b_fix:
+            off = labels[label] - 4 * idx
+            if off % 2 != 0:
+                raise ValueError(f"Branch offset not 2-byte aligned: {label} off={off}")
+            words[idx] = BR_ENC[which](rs1, rs2, off)
+        for idx, rd, label in self._jal_fix:
+            off = labels[label] - 4 * idx
+            if off % 2 != 0:
+                raise ValueError(f"JAL offset not 2-byte aligned: {label} off={off}")
+            words[idx] = JAL(rd, off)
 
 
 def main():